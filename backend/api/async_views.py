@@ -0,0 +1,168 @@
+import asyncio
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django_filters.utils import translate_validation
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+
+from api.filters import RecipeFilter
+from api.pagination import PageLimitPagination
+from api.renderers import JSONRenderer
+from api.response_cache import recipe_response_cache
+from api.serializers import FollowReadSerializer, RecipeSerializer
+from api.snapshots import ingredients_snapshot, tags_snapshot
+from api.views import (IngredientViewSet, RecipeViewSet, TagsViewSet,
+                       UsersViewSet, aload_subscriptions, get_recipe_id,
+                       get_recipe_queryset, get_subscriptions_queryset)
+from recipes.ingredient_index import ingredient_index
+
+# Ограничивает число одновременных запросов к базе в одном процессе,
+# а значит и число открытых соединений.
+db_slots = asyncio.Semaphore(settings.ASYNC_DB_CONCURRENCY)
+
+
+async def authenticate(request):
+    """
+    Пользователь по заголовку Authorization: Token через async ORM.
+    Возвращает None для неверного токена.
+    """
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if keyword.lower() != 'token':
+        return AnonymousUser()
+    token = await Token.objects.select_related('user').filter(
+        key=key.strip()).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+def accepts_json(request):
+    return ('format' not in request.GET
+            and 'text/html' not in request.headers.get('Accept', ''))
+
+
+def json_response(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status,
+                        content_type='application/json')
+
+
+def async_api_view(viewset, actions):
+    """
+    Асинхронное представление для GET-запросов JSON API.
+    Остальные методы, браузерный рендер, неверный токен и случаи,
+    когда представление вернуло None, обрабатывает синхронный вьюсет.
+    """
+    sync_view = sync_to_async(viewset.as_view(actions))
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or not accepts_json(request):
+                return await sync_view(request, *args, **kwargs)
+            user = await authenticate(request)
+            if user is None:
+                return await sync_view(request, *args, **kwargs)
+            drf_request = Request(request)
+            drf_request.user = user
+            try:
+                async with db_slots:
+                    data = await view(drf_request, *args, **kwargs)
+            except APIException as exc:
+                return json_response(
+                    exc.detail if isinstance(exc.detail, (list, dict))
+                    else {'detail': exc.detail}, exc.status_code)
+            if data is None:
+                return await sync_view(request, *args, **kwargs)
+            if isinstance(data, HttpResponse):
+                return data
+            return json_response(data)
+        wrapper = csrf_exempt(wrapper)
+        # Как у as_view: по ним middleware подписывает метрики запроса.
+        wrapper.cls, wrapper.actions = viewset, actions
+        return wrapper
+    return decorator
+
+
+def filter_recipes(request):
+    filterset = RecipeFilter(
+        request.query_params, queryset=get_recipe_queryset(request.user),
+        request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+@async_api_view(RecipeViewSet, {'get': 'list', 'post': 'create'})
+async def recipe_list(request):
+    key = None
+    if not request.user.is_authenticated:
+        key = await recipe_response_cache.aget_list_key(request)
+        data = await recipe_response_cache.aget(key)
+        if data is not None:
+            return data
+    queryset = await sync_to_async(filter_recipes)(request)
+    paginator = PageLimitPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    context = {'request': request, 'subscriptions': await aload_subscriptions(
+        request.user, {recipe.author_id for recipe in page})}
+    data = paginator.get_paginated_response(
+        RecipeSerializer(page, many=True, context=context).data).data
+    if key is not None:
+        await recipe_response_cache.aset(key, data)
+    return data
+
+
+@async_api_view(RecipeViewSet, {'get': 'retrieve', 'put': 'update',
+                                'patch': 'partial_update',
+                                'delete': 'destroy'})
+async def recipe_detail(request, pk):
+    pk = get_recipe_id(pk)
+    key = None
+    if not request.user.is_authenticated:
+        key = await recipe_response_cache.aget_detail_key(request, pk)
+        data = await recipe_response_cache.aget(key)
+        if data is not None:
+            return data
+    recipe = await get_recipe_queryset(request.user).filter(pk=pk).afirst()
+    if recipe is None:
+        raise NotFound('No Recipe matches the given query.')
+    context = {'request': request, 'subscriptions': await aload_subscriptions(
+        request.user, {recipe.author_id})}
+    data = RecipeSerializer(recipe, context=context).data
+    if key is not None:
+        await recipe_response_cache.aset(key, data)
+    return data
+
+
+@async_api_view(TagsViewSet, {'get': 'list'})
+async def tag_list(request):
+    return await tags_snapshot.aresponse(request)
+
+
+@async_api_view(IngredientViewSet, {'get': 'list'})
+async def ingredient_list(request):
+    name = request.query_params.get('name')
+    if name:
+        return await ingredient_index.asearch(name)
+    return await ingredients_snapshot.aresponse(request)
+
+
+@async_api_view(UsersViewSet, {'get': 'subscriptions'})
+async def subscriptions(request):
+    if not request.user.is_authenticated:
+        return None
+    queryset = get_subscriptions_queryset(
+        request.user, request.query_params.get('recipes_limit'))
+    paginator = PageLimitPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    context = {'request': request, 'subscriptions': await aload_subscriptions(
+        request.user, {follow.author_id for follow in page})}
+    return paginator.get_paginated_response(
+        FollowReadSerializer(page, many=True, context=context).data).data
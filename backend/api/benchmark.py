@@ -0,0 +1,256 @@
+import json
+import math
+
+from random import Random
+from statistics import median
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from recipes.content_hash import get_content_hash
+from recipes.counters import recompute_favorites_count, recompute_recipes_count
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+TAGS_COUNT = 5
+
+# Эндпоинты в порядке выполнения за одну итерацию: парные POST и DELETE
+# возвращают данные в исходное состояние. Не измеряются создание рецепта
+# (пишет картинку в хранилище), вход и смена пароля (хеширование пароля).
+ENDPOINTS = (
+    ('recipes-list-anonymous', 'get', '/api/recipes/', None, False),
+    ('recipes-list', 'get', '/api/recipes/', None, True),
+    ('recipes-list-page', 'get', '/api/recipes/?page=3&limit=6', None, True),
+    ('recipes-list-cursor', 'get', '/api/recipes/?cursor=', None, True),
+    ('recipes-list-tags', 'get', '/api/recipes/?tags={tag}', None, True),
+    ('recipes-list-author', 'get', '/api/recipes/?author={author_id}',
+     None, True),
+    ('recipes-list-favorited', 'get', '/api/recipes/?is_favorited=1',
+     None, True),
+    ('recipes-list-in-cart', 'get', '/api/recipes/?is_in_shopping_cart=1',
+     None, True),
+    ('recipes-detail-anonymous', 'get', '/api/recipes/{recipe_id}/',
+     None, False),
+    ('recipes-detail', 'get', '/api/recipes/{recipe_id}/', None, True),
+    ('recipes-update', 'patch', '/api/recipes/{own_recipe_id}/',
+     'own_recipe', True),
+    ('recipes-favorite-add', 'post', '/api/recipes/{recipe_id}/favorite/',
+     None, True),
+    ('recipes-favorite-remove', 'delete',
+     '/api/recipes/{recipe_id}/favorite/', None, True),
+    ('recipes-cart-add', 'post', '/api/recipes/{recipe_id}/shopping_cart/',
+     None, True),
+    ('recipes-cart-remove', 'delete',
+     '/api/recipes/{recipe_id}/shopping_cart/', None, True),
+    ('download-shopping-cart', 'get',
+     '/api/recipes/download_shopping_cart/?format=txt', None, True),
+    ('subscriptions', 'get', '/api/users/subscriptions/', None, True),
+    ('subscriptions-recipes-limit', 'get',
+     '/api/users/subscriptions/?recipes_limit=3', None, True),
+    ('subscribe', 'post', '/api/users/{author_id}/subscribe/', None, True),
+    ('unsubscribe', 'delete', '/api/users/{author_id}/subscribe/',
+     None, True),
+    ('users-list', 'get', '/api/users/', None, True),
+    ('users-me', 'get', '/api/users/me/', None, True),
+    ('users-detail', 'get', '/api/users/{author_id}/', None, True),
+    ('tags-list', 'get', '/api/tags/', None, False),
+    ('ingredients-list', 'get', '/api/ingredients/', None, False),
+    ('ingredients-search', 'get', '/api/ingredients/?name={ingredient}',
+     None, False),
+)
+
+
+def seed(users=100, recipes=1000, ingredients=1000,
+         ingredients_per_recipe=8, favorites=20, cart=10, follows=10,
+         random_seed=0):
+    """
+    Заполняет пустую базу воспроизводимым набором данных.
+    favorites, cart и follows задаются на одного пользователя.
+    Возвращает параметры для подстановки в пути ENDPOINTS.
+    """
+    random = Random(random_seed)
+    password = make_password(None)
+    with transaction.atomic():
+        user_objects = User.objects.bulk_create(
+            (User(username=f'user{index}', email=f'user{index}@example.com',
+                  first_name='Имя', last_name='Фамилия', password=password)
+             for index in range(users)), batch_size=BATCH_SIZE)
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {index}', color=f'#{index:06X}',
+                slug=f'tag{index}')
+            for index in range(TAGS_COUNT))
+        ingredient_ids = [ingredient.id for ingredient in
+                          Ingredient.objects.bulk_create(
+                              (Ingredient(name=f'ингредиент {index}',
+                                          measurement_unit='г')
+                               for index in range(ingredients)),
+                              batch_size=BATCH_SIZE)]
+        recipe_objects = []
+        for index in range(recipes):
+            name, text = f'Рецепт {index}', f'Описание рецепта {index}'
+            recipe_objects.append(Recipe(
+                author=user_objects[index % users], name=name, text=text,
+                image='recipes/benchmark.png',
+                cooking_time=random.randint(1, 120),
+                content_hash=get_content_hash(name, text)))
+        recipe_objects = Recipe.objects.bulk_create(
+            recipe_objects, batch_size=BATCH_SIZE)
+        recipe_ids = [recipe.id for recipe in recipe_objects]
+        RecipeIngredient.objects.bulk_create(
+            (RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                              amount=random.randint(1, 500))
+             for recipe_id in recipe_ids
+             for ingredient_id in random.sample(
+                 ingredient_ids,
+                 min(ingredients_per_recipe, len(ingredient_ids)))),
+            batch_size=BATCH_SIZE)
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.id)
+             for recipe_id in recipe_ids
+             for tag in random.sample(tags, 2)),
+            batch_size=BATCH_SIZE)
+        # Первый пользователь измеряется: рецепт recipe_ids[1] не должен
+        # быть у него в избранном и корзине, а на автора этого рецепта
+        # user_objects[1] он не подписан.
+        main_recipe_ids = recipe_ids[:1] + recipe_ids[2:]
+        for model, per_user in ((Favorite, favorites), (ShoppingCart, cart)):
+            model.objects.bulk_create(
+                (model(user=user, recipe_id=recipe_id)
+                 for index, user in enumerate(user_objects)
+                 for recipe_id in random.sample(
+                     main_recipe_ids if index == 0 else recipe_ids,
+                     min(per_user, recipes - (index == 0)))),
+                batch_size=BATCH_SIZE)
+        Follow.objects.bulk_create(
+            (Follow(follower=user,
+                    author=user_objects[other + (other >= index)])
+             for index, user in enumerate(user_objects)
+             for other in random.sample(
+                 range(index == 0, users - 1),
+                 min(follows, users - 1 - (index == 0)))),
+            batch_size=BATCH_SIZE)
+        user_ids = [user.id for user in user_objects]
+        recompute_favorites_count(recipe_ids)
+        recompute_recipes_count(user_ids)
+        ShoppingListItem.objects.rebuild(user_ids)
+
+    own_recipe = recipe_objects[0]
+    return {
+        'user': user_objects[0],
+        'recipe_id': recipe_ids[1],
+        'own_recipe_id': own_recipe.id,
+        'own_recipe': {
+            'name': own_recipe.name,
+            'text': own_recipe.text,
+            'cooking_time': own_recipe.cooking_time,
+            'tags': list(own_recipe.tags.values_list('id', flat=True)),
+            'ingredients': [
+                {'id': ingredient_id, 'amount': amount}
+                for ingredient_id, amount
+                in own_recipe.recipeingredient.values_list(
+                    'ingredient_id', 'amount')
+            ],
+        },
+        'author_id': user_objects[1].id,
+        'tag': tags[0].slug,
+        'ingredient': 'ингредиент 1',
+    }
+
+
+class QueryTimer:
+    """execute_wrapper, считающий SQL-запросы и их суммарное время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - start
+            self.count += 1
+
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def run(params, iterations=30, warmup=3, cold=True):
+    """
+    Прогоняет ENDPOINTS через тестовый клиент Django.
+    При cold кеш очищается перед каждой итерацией: первые запросы
+    итерации выполняются с пустым кешем, как после сброса версий.
+    Возвращает для каждого эндпоинта перцентили задержки в мс,
+    число SQL-запросов и медиану суммарного времени SQL.
+    """
+    anonymous = Client()
+    client = Client(headers={
+        'Authorization':
+            f'Token {Token.objects.get_or_create(user=params["user"])[0].key}'
+    })
+    samples = {name: [] for name, *_ in ENDPOINTS}
+    for iteration in range(warmup + iterations):
+        if cold:
+            cache.clear()
+        for name, method, path, payload, authenticated in ENDPOINTS:
+            request = getattr(client if authenticated else anonymous, method)
+            kwargs = {}
+            if payload is not None:
+                kwargs = {'data': json.dumps(params[payload]),
+                          'content_type': 'application/json'}
+            timer = QueryTimer()
+            with connection.execute_wrapper(timer):
+                start = perf_counter()
+                response = request(path.format(**params), **kwargs)
+                elapsed = perf_counter() - start
+            if iteration >= warmup:
+                samples[name].append((elapsed, timer.count, timer.duration,
+                                      response.status_code))
+    results = {}
+    for name, values in samples.items():
+        timings = sorted(value[0] for value in values)
+        results[name] = {
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 3),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+            'queries': max(value[1] for value in values),
+            'sql_ms': round(median(value[2] for value in values) * 1000, 3),
+            'statuses': sorted({value[3] for value in values}),
+        }
+    return results
+
+
+def compare(results, baseline, threshold=0.2, min_delta_ms=1.0):
+    """
+    Регрессии относительно прошлого прогона: рост числа запросов
+    или рост p95 больше чем на threshold и больше чем на min_delta_ms.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: запросов {previous["queries"]} -> '
+                f'{current["queries"]}')
+        delta = current['p95_ms'] - previous['p95_ms']
+        if (delta > min_delta_ms
+                and current['p95_ms'] > previous['p95_ms'] * (1 + threshold)):
+            regressions.append(
+                f'{name}: p95 {previous["p95_ms"]} -> '
+                f'{current["p95_ms"]} мс')
+    return regressions
@@ -0,0 +1,146 @@
+import csv
+import io
+import json
+import os
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.middleware import add_render_time
+from recipes.ingredient_index import ingredient_index
+from recipes.models import ShoppingListItem
+from recipes.shopping_cart import get_cart_version
+
+TITLE = 'Список покупок'
+
+
+def render_txt(items):
+    lines = [TITLE + '\n' + '\n']
+    lines.extend(f'- {name} ({unit}): {amount}\n'
+                 for name, unit, amount in items)
+    return ''.join(lines).encode()
+
+
+def render_csv(items):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(('name', 'measurement_unit', 'amount'))
+    writer.writerows(items)
+    return buffer.getvalue().encode()
+
+
+def render_json(items):
+    return json.dumps(
+        [{'name': name, 'measurement_unit': unit, 'amount': amount}
+         for name, unit, amount in items],
+        ensure_ascii=False).encode()
+
+
+def render_pdf(items, font_path=None):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    font = 'Helvetica'
+    if font_path and os.path.exists(font_path):
+        pdfmetrics.registerFont(TTFont('ShoppingCartFont', font_path))
+        font = 'ShoppingCartFont'
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    _, height = A4
+    pdf.setFont(font, 16)
+    pdf.drawString(50, height - 50, TITLE)
+    pdf.setFont(font, 12)
+    y = height - 80
+    for name, unit, amount in items:
+        if y < 50:
+            pdf.showPage()
+            pdf.setFont(font, 12)
+            y = height - 50
+        pdf.drawString(50, y, f'- {name} ({unit}): {amount}')
+        y -= 18
+    pdf.save()
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    'txt': render_txt,
+    'csv': render_csv,
+    'json': render_json,
+    'pdf': render_pdf,
+}
+BACKGROUND_FORMATS = ('pdf',)
+FILENAMES = {
+    'txt': 'shopping_cart.txt',
+    'csv': 'shopping_cart.csv',
+    'json': 'shopping_cart.json',
+    'pdf': settings.SHOPPING_CART_FILENAME,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.SHOPPING_CART_RENDER_WORKERS)
+        return _executor
+
+
+def get_items(user):
+    return list(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+    ).order_by('ingredient__name'))
+
+
+def get_cache_key(user, file_format):
+    return (f'shopping_cart:{user.id}:{get_cart_version(user.id)}:'
+            f'{ingredient_index.get_version()}:{file_format}')
+
+
+def render_shopping_cart(user, file_format):
+    """
+    Возвращает файл списка покупок в нужном формате из кеша
+    или рендерит его. Тяжелые форматы рендерятся в пуле процессов:
+    пока файл не готов, возвращается None. Файл отдается HttpResponse
+    в обход рендереров DRF, поэтому время рендера учитывается здесь.
+    """
+    key = get_cache_key(user, file_format)
+    content = cache.get(key)
+    if content is not None:
+        return content
+    if file_format not in BACKGROUND_FORMATS:
+        items = get_items(user)
+        start = perf_counter()
+        content = RENDERERS[file_format](items)
+        add_render_time(perf_counter() - start)
+        cache.set(key, content, settings.SHOPPING_CART_CACHE_TIMEOUT)
+        return content
+    with _executor_lock:
+        if key in _pending:
+            return None
+        _pending.add(key)
+    future = get_executor().submit(
+        RENDERERS[file_format], get_items(user),
+        settings.SHOPPING_CART_FONT)
+    future.add_done_callback(lambda done: store_result(key, done))
+    return None
+
+
+def store_result(key, future):
+    try:
+        if future.exception() is None:
+            cache.set(key, future.result(),
+                      settings.SHOPPING_CART_CACHE_TIMEOUT)
+    finally:
+        with _executor_lock:
+            _pending.discard(key)
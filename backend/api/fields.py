@@ -1,15 +1,204 @@
 import base64
+import binascii
 
-from django.core.files.base import ContentFile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile)
+from PIL import Image, UnidentifiedImageError
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from recipes.images import get_variant_names
+
+BASE64_SEPARATOR = ';base64,'
 
 
 class Base64ImageField(serializers.ImageField):
-    """Сериализатор для картинок."""
+    """
+    Сериализатор для картинок.
+    Строка base64 декодируется частями в файл в памяти или во временный
+    файл на диске, размеры и число пикселей проверяются до полного
+    декодирования.
+    """
+
+    default_error_messages = {
+        'invalid_base64': 'Некорректное изображение в base64.',
+        'encoded_too_large': ('Строка изображения длиннее '
+                              '{max_size} символов.'),
+        'too_large': 'Размер изображения больше {max_size} байт.',
+        'too_many_pixels': 'Изображение больше {max_pixels} пикселей.',
+    }
+    chunk_size = 64 * 1024
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = self.decode(data)
         return super().to_internal_value(data)
+
+    def decode(self, data):
+        separator = data.find(BASE64_SEPARATOR)
+        if separator == -1:
+            self.fail('invalid_base64')
+        ext = data[:separator].split('/')[-1]
+        start = separator + len(BASE64_SEPARATOR)
+        encoded_size = len(data) - start
+        if encoded_size > settings.BASE64_IMAGE_MAX_ENCODED_SIZE:
+            self.fail('encoded_too_large',
+                      max_size=settings.BASE64_IMAGE_MAX_ENCODED_SIZE)
+        size = encoded_size // 4 * 3
+        if size > settings.BASE64_IMAGE_MAX_SIZE:
+            self.fail('too_large', max_size=settings.BASE64_IMAGE_MAX_SIZE)
+
+        name, content_type = f'temp.{ext}', f'image/{ext}'
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            file = TemporaryUploadedFile(name, content_type, size, None)
+            self.close_with_request(file)
+        else:
+            file = InMemoryUploadedFile(
+                BytesIO(), None, name, content_type, size, None)
+        try:
+            checked = False
+            tail = ''
+            for offset in range(start, len(data), self.chunk_size):
+                # Base64 в формате MIME переносится по строкам: пробельные
+                # символы убираются, а остаток короче четырех символов
+                # переходит в следующую часть.
+                chunk = tail + ''.join(
+                    data[offset:offset + self.chunk_size].split())
+                aligned = len(chunk) - len(chunk) % 4
+                chunk, tail = chunk[:aligned], chunk[aligned:]
+                self.write_decoded(file, chunk)
+                if not checked:
+                    checked = self.check_pixels(file)
+            if tail:
+                self.write_decoded(file, tail)
+            if not checked:
+                self.check_pixels(file)
+        except serializers.ValidationError:
+            file.close()
+            raise
+        file.size = file.tell()
+        file.seek(0)
+        return file
+
+    def write_decoded(self, file, chunk):
+        try:
+            file.write(base64.b64decode(chunk, validate=True))
+        except binascii.Error:
+            self.fail('invalid_base64')
+
+    def close_with_request(self, file):
+        """Временный файл закрывается вместе с запросом, как при upload."""
+        request = self.context.get('request')
+        if request is not None:
+            request._request.FILES.appendlist(self.field_name, file)
+
+    def check_pixels(self, file):
+        """
+        Проверяет число пикселей по заголовку уже декодированной части.
+        Возвращает False, если заголовок еще не прочитан целиком.
+        """
+        position = file.tell()
+        file.seek(0)
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self.fail('too_many_pixels',
+                      max_pixels=settings.BASE64_IMAGE_MAX_PIXELS)
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            return False
+        finally:
+            file.seek(position)
+        if width * height > settings.BASE64_IMAGE_MAX_PIXELS:
+            self.fail('too_many_pixels',
+                      max_pixels=settings.BASE64_IMAGE_MAX_PIXELS)
+        return True
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Ссылки на уменьшенные копии картинки рецепта.
+    Пока копии не созданы, отдается ссылка на оригинал. Готовность
+    берется из поля рецепта variants_image_name, хранилище не опрашивается.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'image')
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        ready = value.instance.variants_ready()
+        urls = {}
+        for variant, name in get_variant_names(value.name).items():
+            url = default_storage.url(name) if ready else value.url
+            urls[variant] = (request.build_absolute_uri(url)
+                             if request is not None else url)
+        return urls
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который берет объекты из словаря,
+    загруженного одним запросом на весь список, а не по запросу
+    на каждый ключ.
+    """
+
+    objects = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def load(self, values):
+        """Загружает объекты для всех корректных ключей из values."""
+        pk_field = self.get_queryset().model._meta.pk
+        pks = set()
+        for value in values:
+            if isinstance(value, (bool, dict, list)):
+                continue
+            try:
+                pks.add(pk_field.to_python(value))
+            except ValidationError:
+                continue
+        self.objects = {
+            str(pk): obj
+            for pk, obj in self.get_queryset().in_bulk(pks).items()
+        }
+
+    def to_internal_value(self, data):
+        if self.objects is None:
+            return super().to_internal_value(data)
+        if isinstance(data, (bool, dict, list)):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = self.objects.get(str(data))
+        if obj is None:
+            try:
+                self.get_queryset().model._meta.pk.to_python(data)
+            except ValidationError:
+                self.fail('incorrect_type', data_type=type(data).__name__)
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список первичных ключей, проверяемый одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        self.child_relation.load(data)
+        return [self.child_relation.to_internal_value(item) for item in data]
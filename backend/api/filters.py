@@ -31,8 +31,7 @@ class RecipeFilter(django_filters.FilterSet):
         field_name='is_favorited',
         method='filter_is_favorited',)
 
-    tags = django_filters.AllValuesMultipleFilter(
-        field_name='tags__slug', lookup_expr='iexact')
+    tags = django_filters.AllValuesMultipleFilter(field_name='tags__slug')
 
     class Meta:
         model = Recipe
@@ -40,12 +39,10 @@ class RecipeFilter(django_filters.FilterSet):
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(
-                shoppingcart_relations__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(
-                favorite_relations__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
@@ -0,0 +1,163 @@
+import json
+import logging
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger('api.timing')
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+SLOW_REQUEST_TOP_QUERIES = 5
+
+SQL_LOG_LENGTH = 500
+
+
+class RequestMetrics:
+    """
+    Счетчики одного запроса: SQL, сериализация, рендер ответа
+    и общее время.
+    """
+
+    __slots__ = ('start', 'db_time', 'serialize_time', 'serializing',
+                 'render_time', 'statements')
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.db_time = 0
+        self.serialize_time = 0
+        self.serializing = False
+        self.render_time = 0
+        self.statements = []
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    execute_wrapper для всех соединений (api.signals): учитывает запрос
+    в метриках текущего запроса, вне запроса ничего не делает.
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += perf_counter() - start
+        metrics.statements.append(sql)
+
+
+@contextmanager
+def measure_serialization():
+    """
+    Учитывает время сериализации ответа. Вложенные сериализаторы
+    выполняются внутри внешнего и повторно не учитываются.
+    SQL ленивых запросов внутри сериализации входит и в db, и в serialize.
+    """
+    metrics = current_metrics.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializing = False
+        metrics.serialize_time += perf_counter() - start
+
+
+def add_render_time(duration):
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.render_time += duration
+
+
+def get_view_name(request):
+    """Вьюсет и действие DRF, например RecipeViewSet.list."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class RequestTimingMiddleware:
+    """
+    Заголовок Server-Timing с временем SQL, сериализации, рендера ответа
+    и всего запроса, а для запросов дольше SLOW_REQUEST_THRESHOLD_MS - запись
+    в лог api.timing с самыми частыми повторяющимися SQL-запросами.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        total = perf_counter() - metrics.start
+        view = get_view_name(request)
+        response['Server-Timing'] = ', '.join((
+            f'db;desc="count={len(metrics.statements)}";'
+            f'dur={metrics.db_time * 1000:.2f}',
+            f'serialize;dur={metrics.serialize_time * 1000:.2f}',
+            f'render;dur={metrics.render_time * 1000:.2f}',
+            f'total;desc="{view or request.path}";dur={total * 1000:.2f}',
+        ))
+        if total * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            self.log_slow_request(request, response, metrics, view, total)
+        return response
+
+    @staticmethod
+    def log_slow_request(request, response, metrics, view, total):
+        repeated = [
+            {'count': count, 'sql': sql[:SQL_LOG_LENGTH]}
+            for sql, count in Counter(metrics.statements).most_common(
+                SLOW_REQUEST_TOP_QUERIES)
+            if count > 1
+        ]
+        logger.warning(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'view': view,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'queries': len(metrics.statements),
+            'serialize_ms': round(metrics.serialize_time * 1000, 2),
+            'render_ms': round(metrics.render_time * 1000, 2),
+            'repeated_queries': repeated,
+        }, ensure_ascii=False))
@@ -1,7 +1,298 @@
+import base64
+import hashlib
+import json
+
+from datetime import datetime
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections, transaction
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+PK_FIELDS = ('id', 'pk')
+COUNT_VERSION_KEY = 'pagination:count-version'
+
+
+def get_count_version():
+    return cache.get_or_set(COUNT_VERSION_KEY, uuid4().hex, timeout=None)
+
+
+async def aget_count_version():
+    return await cache.aget_or_set(
+        COUNT_VERSION_KEY, uuid4().hex, timeout=None)
+
+
+def invalidate_counts():
+    """
+    Сбрасывает все закешированные COUNT пагинации после коммита:
+    иначе параллельный запрос сохранил бы старый COUNT под новой версией.
+    """
+    transaction.on_commit(lambda: cache.set(
+        COUNT_VERSION_KEY, uuid4().hex, timeout=None))
+
+
+def get_keyset_ordering(queryset):
+    """
+    Возвращает сортировку queryset, пригодную для keyset-пагинации:
+    простые поля модели, последнее из которых - первичный ключ.
+    """
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    if not ordering or not all(isinstance(field, str) for field in ordering):
+        return None
+    if ordering[-1].lstrip('-') not in PK_FIELDS:
+        return None
+    if any('__' in field or field.startswith('?') for field in ordering):
+        return None
+    return tuple(ordering)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по курсору без COUNT и OFFSET.
+    Курсор хранит значения полей сортировки последнего объекта страницы,
+    следующая страница выбирается условием по этим значениям.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = settings.PAGE_SIZE
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None,
+                          ordering=None):
+        self.request = request
+        self.ordering = ordering or get_keyset_ordering(queryset)
+        self.page_size = self.get_page_size(request)
+        position, self.reverse = self.decode_cursor(request)
+        self.has_cursor = position is not None
+
+        if self.reverse:
+            queryset = queryset.order_by(*self.invert(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    @staticmethod
+    def invert(ordering):
+        return tuple(field[1:] if field.startswith('-') else '-' + field
+                     for field in ordering)
+
+    def get_keyset_filter(self, position):
+        ordering = (self.invert(self.ordering) if self.reverse
+                    else self.ordering)
+        keyset_filter = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{name}__{lookup}': position[index]})
+            for previous, value in zip(ordering[:index], position):
+                condition &= Q(**{previous.lstrip('-'): value})
+            keyset_filter |= condition
+        return keyset_filter
+
+    def get_position(self, obj):
+        position = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def encode_cursor(self, position, reverse=False):
+        data = json.dumps({'p': position, 'r': reverse})
+        cursor = base64.urlsafe_b64encode(data.encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            position, reverse = data['p'], bool(data['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if (not isinstance(position, list)
+                or len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_next_link(self):
+        if not self.page or (not self.has_more and not self.reverse):
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.page or not self.has_cursor:
+            return None
+        if self.reverse and not self.has_more:
+            return None
+        return self.encode_cursor(
+            self.get_position(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class CachedCountPaginator(DjangoPaginator):
+    """
+    Paginator, кеширующий COUNT по SQL запроса на короткое время.
+    Кеш сбрасывается при изменении рецептов, избранного, корзины,
+    подписок и при регистрации и удалении пользователей.
+    """
+
+    estimate = False
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        key = self.get_count_key(get_count_version())
+        count = cache.get(key)
+        if count is None:
+            count = self.get_count(self.object_list.order_by())
+            cache.set(key, count, settings.PAGINATION_COUNT_TIMEOUT)
+        return count
+
+    async def acount(self):
+        """Асинхронный вариант count для ASGI-представлений."""
+        if 'count' not in self.__dict__:
+            key = self.get_count_key(await aget_count_version())
+            count = await cache.aget(key)
+            if count is None:
+                count = await sync_to_async(self.get_count)(
+                    self.object_list.order_by())
+                await cache.aset(key, count, settings.PAGINATION_COUNT_TIMEOUT)
+            self.count = count
+        return self.count
+
+    def get_count_key(self, version):
+        """
+        Ключ по SQL выборки без сортировки и невыбранных аннотаций:
+        флаги with_user_flags попадают в ключ, только когда по ним
+        фильтруют, иначе у каждого пользователя был бы свой ключ.
+        """
+        sql, params = self.object_list.order_by().values(
+            'pk').query.sql_with_params()
+        digest = hashlib.md5(
+            repr((self.estimate, sql, params)).encode()).hexdigest()
+        return f'pagination:count:{version}:{digest}'
+
+    def get_count(self, queryset):
+        return queryset.count()
+
+
+class EstimatedCountPaginator(CachedCountPaginator):
+    """
+    Paginator с приблизительным COUNT: на Postgres берется оценка
+    планировщика, на остальных базах счет ограничивается сверху.
+    Небольшие выборки все равно считаются точно.
+    """
+
+    estimate = True
+
+    def get_count(self, queryset):
+        cap = settings.PAGINATION_COUNT_CAP
+        if connections[queryset.db].vendor == 'postgresql':
+            estimate = self.get_planner_estimate(queryset)
+            if estimate >= cap:
+                return estimate
+            return queryset.count()
+        return queryset[:cap].count()
+
+    @staticmethod
+    def get_planner_estimate(queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
 
 
 class PageLimitPagination(PageNumberPagination):
+    """
+    Постраничная пагинация с параметром limit.
+    При наличии параметра cursor в запросе переключается
+    на KeysetPagination, если сортировка это позволяет.
+    """
+
     page_size_query_param = 'limit'
     page_size = settings.PAGE_SIZE
+    cursor_query_param = KeysetPagination.cursor_query_param
+    django_paginator_class = (
+        EstimatedCountPaginator if settings.PAGINATION_COUNT_ESTIMATE
+        else CachedCountPaginator)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param in request.query_params:
+            ordering = get_keyset_ordering(queryset)
+            if ordering:
+                self.keyset = KeysetPagination()
+                return self.keyset.paginate_queryset(
+                    queryset, request, view=view, ordering=ordering)
+        return super().paginate_queryset(queryset, request, view=view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Асинхронный вариант paginate_queryset: COUNT и страница
+        выбираются через async ORM, курсорный режим - в потоке.
+        """
+        if (self.cursor_query_param in request.query_params
+                and get_keyset_ordering(queryset)):
+            return await sync_to_async(self.paginate_queryset)(
+                queryset, request, view=view)
+        self.keyset = None
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        await paginator.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
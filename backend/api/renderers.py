@@ -0,0 +1,61 @@
+import json
+
+from time import perf_counter
+
+from rest_framework import renderers
+
+from api.middleware import add_render_time
+
+
+class TimedRenderMixin:
+    """Учитывает время рендера в метриках запроса (api.middleware)."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        start = perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            add_render_time(perf_counter() - start)
+
+
+class JSONRenderer(TimedRenderMixin, renderers.JSONRenderer):
+    pass
+
+
+class BaseFileRenderer(renderers.BaseRenderer):
+    """
+    Рендерер готовых файлов: байты отдаются как есть,
+    остальные данные (например, ошибки) - в виде JSON.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return json.dumps(data, ensure_ascii=False).encode()
+
+
+class FileRenderer(TimedRenderMixin, BaseFileRenderer):
+    pass
+
+
+class PlainTextFileRenderer(FileRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVFileRenderer(FileRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class JSONFileRenderer(FileRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+
+class PDFFileRenderer(FileRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
@@ -0,0 +1,117 @@
+import hashlib
+
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import urlencode
+
+CATALOG_VERSION_KEY = 'recipes:response:catalog-version'
+LIST_VERSION_KEY = 'recipes:response:list-version'
+
+
+def get_recipe_version_key(recipe_id):
+    return f'recipes:response:{recipe_id}:version'
+
+
+def get_versions(*keys):
+    """Текущие версии по ключам, недостающие создаются одним set_many."""
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(*keys):
+    """Асинхронный вариант get_versions."""
+    versions = await cache.aget_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        await cache.aset_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(keys):
+    """
+    Меняет версии после коммита транзакции: иначе параллельный запрос
+    успел бы сохранить под новой версией еще не измененные данные.
+    """
+    keys = list(keys)
+    transaction.on_commit(lambda: cache.set_many(
+        {key: uuid4().hex for key in keys}, timeout=None))
+
+
+def invalidate_catalog():
+    """Сбрасывает все ответы: изменились теги или ингредиенты."""
+    bump_versions([CATALOG_VERSION_KEY])
+
+
+def invalidate_recipes(recipe_ids):
+    """Сбрасывает списки рецептов и карточки рецептов recipe_ids."""
+    bump_versions([LIST_VERSION_KEY,
+                   *map(get_recipe_version_key, recipe_ids)])
+
+
+class RecipeResponseCache:
+    """
+    Кеш данных ответов списка и карточки рецепта для анонимов.
+    Ключ содержит версии, прочитанные до выполнения запроса, поэтому
+    ответ, собранный во время параллельной записи, сохраняется под уже
+    устаревшим ключом и не отдается. Таймаут нужен только для вытеснения.
+    """
+
+    @staticmethod
+    def get_request_key(request):
+        params = sorted(
+            (key, value) for key in request.query_params
+            for value in request.query_params.getlist(key))
+        return hashlib.md5(
+            f'{request.scheme}://{request.get_host()}?'
+            f'{urlencode(params)}'.encode()).hexdigest()
+
+    def make_list_key(self, request, catalog, recipes):
+        return (f'recipes:response:list:{catalog}:{recipes}:'
+                f'{self.get_request_key(request)}')
+
+    def make_detail_key(self, request, recipe_id, catalog, recipe):
+        return (f'recipes:response:detail:{recipe_id}:{catalog}:{recipe}:'
+                f'{self.get_request_key(request)}')
+
+    def get_list_key(self, request):
+        return self.make_list_key(request, *get_versions(
+            CATALOG_VERSION_KEY, LIST_VERSION_KEY))
+
+    async def aget_list_key(self, request):
+        return self.make_list_key(request, *await aget_versions(
+            CATALOG_VERSION_KEY, LIST_VERSION_KEY))
+
+    def get_detail_key(self, request, recipe_id):
+        return self.make_detail_key(request, recipe_id, *get_versions(
+            CATALOG_VERSION_KEY, get_recipe_version_key(recipe_id)))
+
+    async def aget_detail_key(self, request, recipe_id):
+        return self.make_detail_key(request, recipe_id, *await aget_versions(
+            CATALOG_VERSION_KEY, get_recipe_version_key(recipe_id)))
+
+    @staticmethod
+    def get(key):
+        return cache.get(key)
+
+    @staticmethod
+    def set(key, data):
+        cache.set(key, data, settings.RECIPE_RESPONSE_CACHE_TIMEOUT)
+
+    @staticmethod
+    async def aget(key):
+        return await cache.aget(key)
+
+    @staticmethod
+    async def aset(key, data):
+        await cache.aset(key, data, settings.RECIPE_RESPONSE_CACHE_TIMEOUT)
+
+
+recipe_response_cache = RecipeResponseCache()
@@ -1,17 +1,32 @@
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from rest_framework.validators import UniqueTogetherValidator
 
-from api.fields import Base64ImageField
+from api.fields import (Base64ImageField, BulkPrimaryKeyRelatedField,
+                        ImageVariantsField)
+from api.middleware import measure_serialization
+from recipes.content_hash import get_content_hash
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
 from users.models import Follow
 
 User = get_user_model()
+DUPLICATE_RECIPE_MESSAGE = 'Такой рецепт уже существует'
 
 
-class UserSerializer(serializers.ModelSerializer):
+class TimedRepresentationMixin:
+    """Учитывает время сериализации в метриках запроса (api.middleware)."""
+
+    def to_representation(self, instance):
+        with measure_serialization():
+            return super().to_representation(instance)
+
+
+class UserSerializer(TimedRepresentationMixin,
+                     serializers.ModelSerializer):
     """Сериализатор для представления пользователей."""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -23,14 +38,18 @@ class UserSerializer(serializers.ModelSerializer):
                             'first_name', 'last_name',)
 
     def get_is_subscribed(self, obj):
+        subscriptions = self.context.get('subscriptions')
+        if subscriptions is not None:
+            return obj.id in subscriptions
         request = self.context.get('request')
-        return (request
-                and request.user.is_authenticated
-                and Follow.objects.filter(
-                    follower=request.user, author=obj).exists())
+        return bool(request
+                    and request.user.is_authenticated
+                    and Follow.objects.filter(
+                        follower=request.user, author=obj).exists())
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedRepresentationMixin,
+                    serializers.ModelSerializer):
     """Сериализатор Тегов."""
 
     class Meta:
@@ -53,10 +72,20 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class RecipeIngredientListSerializer(serializers.ListSerializer):
+    """Список ингредиентов рецепта, проверяемый одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child.fields['id'].load(
+                item.get('id') for item in data if isinstance(item, dict))
+        return super().to_internal_value(data)
+
+
 class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания ингредиентов рецепта."""
 
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         source='ingredient.id',
         queryset=Ingredient.objects.all(),
         required=True,
@@ -65,27 +94,32 @@ class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount')
+        list_serializer_class = RecipeIngredientListSerializer
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedRepresentationMixin,
+                       serializers.ModelSerializer):
     """Сериализатор информации о рецепте."""
 
     ingredients = RecipeIngredientReadSerializer(source='recipeingredient',
                                                  many=True)
     tags = TagSerializer(many=True)
     image = Base64ImageField(required=False, allow_null=True)
+    image_variants = ImageVariantsField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     author = UserSerializer()
 
     class Meta:
         fields = ('id', 'tags', 'author', 'ingredients',
-                  'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time',)
-        read_only_fields = ('author',)
+                  'is_favorited', 'is_in_shopping_cart', 'favorites_count',
+                  'name', 'image', 'image_variants', 'text', 'cooking_time',)
+        read_only_fields = ('author', 'favorites_count')
         model = Recipe
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return bool(
             request
@@ -94,18 +128,19 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
-        return (request
-                and request.user.is_authenticated
-                and ShoppingCart.objects.filter(
-                    user=request.user, recipe=obj).exists())
+        return bool(request
+                    and request.user.is_authenticated
+                    and ShoppingCart.objects.filter(
+                        user=request.user, recipe=obj).exists())
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор создания рецепта."""
 
-    tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                              many=True)
+    tags = BulkPrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True)
     ingredients = RecipeIngredientCreateSerializer(source='recipeingredient',
                                                    many=True,
                                                    required=True,
@@ -124,12 +159,11 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         tags и ingredients.
         Также проверяет уникальность рецепта.
         """
-        request = self.context['request']
-
-        if (request.method == 'POST'
-           and Recipe.objects.filter(
-               name=data['name'], text=data['text']).exists()):
-            raise serializers.ValidationError('Такой рецепт уже существует')
+        name = data.get('name', getattr(self.instance, 'name', ''))
+        text = data.get('text', getattr(self.instance, 'text', ''))
+        if self.instance is None or (name, text) != (
+                self.instance.name, self.instance.text):
+            self.check_duplicate(get_content_hash(name, text))
         tags = data.get('tags')
         if not tags:
             raise serializers.ValidationError('Теги не могут отсутствовать.')
@@ -152,6 +186,33 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             ingredient_ids.add(ingredient_id)
         return data
 
+    def check_duplicate(self, content_hash):
+        recipes = Recipe.objects.filter(content_hash=content_hash)
+        if self.instance is not None:
+            recipes = recipes.exclude(pk=self.instance.pk)
+        if recipes.exists():
+            raise serializers.ValidationError(DUPLICATE_RECIPE_MESSAGE)
+
+    def save(self, **kwargs):
+        """
+        Уникальность рецепта гарантирует индекс по content_hash:
+        если параллельный запрос успел создать такой же рецепт,
+        возвращается та же ошибка валидации.
+        """
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError:
+            data = {**self.validated_data, **kwargs}
+            try:
+                self.check_duplicate(get_content_hash(
+                    data.get('name', getattr(self.instance, 'name', '')),
+                    data.get('text', getattr(self.instance, 'text', ''))))
+            except serializers.ValidationError as error:
+                raise serializers.ValidationError(
+                    {api_settings.NON_FIELD_ERRORS_KEY: error.detail})
+            raise
+
     @staticmethod
     def create_ingredient(items, instance):
         ingredients = []
@@ -174,27 +235,81 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         self.create_ingredient(items, instance)
         return instance
 
+    @staticmethod
+    def update_ingredients(items, instance):
+        """
+        Приводит ингредиенты рецепта к items минимальным набором
+        вставок, обновлений и удалений.
+        Возвращает старые и новые количества {id ингредиента: количество}:
+        bulk-операции и удаление без сигналов корзины не меняют, их
+        правит один change_recipe на весь набор, а не по запросу на строку.
+        """
+        current = {item.ingredient_id: item
+                   for item in instance.recipeingredient.all()}
+        old_amounts = {ingredient_id: item.amount
+                       for ingredient_id, item in current.items()}
+        new_amounts = {item['ingredient']['id'].id: item['amount']
+                       for item in items}
+        removed = old_amounts.keys() - new_amounts.keys()
+        if removed:
+            queryset = RecipeIngredient.objects.filter(
+                recipe=instance, ingredient_id__in=removed)
+            queryset._raw_delete(queryset.db)
+        changed = []
+        for ingredient_id in old_amounts.keys() & new_amounts.keys():
+            if current[ingredient_id].amount != new_amounts[ingredient_id]:
+                current[ingredient_id].amount = new_amounts[ingredient_id]
+                changed.append(current[ingredient_id])
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=instance, ingredient_id=ingredient_id,
+                             amount=new_amounts[ingredient_id])
+            for ingredient_id in new_amounts.keys() - old_amounts.keys())
+        return old_amounts, new_amounts
+
+    @staticmethod
+    def update_tags(tags, instance):
+        """Удаляет и добавляет только изменившиеся теги рецепта."""
+        current = {tag.id for tag in instance.tags.all()}
+        new = {tag.id for tag in tags}
+        if current - new:
+            instance.tags.remove(*(current - new))
+        if new - current:
+            instance.tags.add(*(new - current))
+
     @transaction.atomic
     def update(self, instance, validated_data):
-        items = validated_data.pop('recipeingredient')
-        instance.ingredients.clear()
-        self.create_ingredient(items, instance)
+        old_amounts, new_amounts = self.update_ingredients(
+            validated_data.pop('recipeingredient'), instance)
+        if old_amounts != new_amounts:
+            ShoppingListItem.objects.change_recipe(
+                instance.id, old_amounts, new_amounts)
+        if 'tags' in validated_data:
+            self.update_tags(validated_data.pop('tags'), instance)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance], 'tags',
+            Prefetch('recipeingredient',
+                     queryset=RecipeIngredient.objects.select_related(
+                         'ingredient')))
         serializer = RecipeSerializer(instance, context=self.context)
         return serializer.data
 
 
-class FavoriteReadSerializer(serializers.ModelSerializer):
+class FavoriteReadSerializer(TimedRepresentationMixin,
+                             serializers.ModelSerializer):
     """Сериализатор для чтения избранного."""
 
     image = Base64ImageField(
         required=False, allow_null=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
 
 
@@ -217,11 +332,14 @@ class FavoriteCreateSerializer(serializers.ModelSerializer):
         return serializer.data
 
 
-class RecipeDetailSerializer(serializers.ModelSerializer):
+class RecipeDetailSerializer(TimedRepresentationMixin,
+                             serializers.ModelSerializer):
     """Сериализатор для чтения рецептов, связанных с автором."""
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class FollowCreateSerializer(serializers.ModelSerializer):
@@ -250,7 +368,8 @@ class FollowCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class FollowReadSerializer(serializers.ModelSerializer):
+class FollowReadSerializer(TimedRepresentationMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для чтения информации о подписках."""
 
     id = serializers.PrimaryKeyRelatedField(source='author', read_only=True)
@@ -260,7 +379,8 @@ class FollowReadSerializer(serializers.ModelSerializer):
     email = serializers.StringRelatedField(source='author.email')
     recipes = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(
+        source='author.recipes_count', read_only=True)
 
     class Meta:
         model = Follow
@@ -272,27 +392,29 @@ class FollowReadSerializer(serializers.ModelSerializer):
                             'recipes_count', 'recipes')
 
     def get_is_subscribed(self, obj):
+        subscriptions = self.context.get('subscriptions')
+        if subscriptions is not None:
+            return obj.author_id in subscriptions
         request = self.context.get('request')
-        return (request
-                and request.user.is_authenticated
-                and Follow.objects.filter(
-                    follower=request.user, author=obj.author).exists())
+        return bool(request
+                    and request.user.is_authenticated
+                    and Follow.objects.filter(
+                        follower=request.user, author=obj.author).exists())
 
     def get_recipes(self, obj):
         request = self.context.get('request')
         if request is None:
             return []
-        limit = request.query_params.get('recipes_limit')
-        recipes = obj.author.recipe.all()
-        if limit:
-            recipes = recipes[:int(limit)]
+        recipes = getattr(obj.author, 'recipes_preview', None)
+        if recipes is None:
+            limit = request.query_params.get('recipes_limit')
+            recipes = obj.author.recipe.all()
+            if limit and limit.isdigit():
+                recipes = recipes[:int(limit)]
         serializer = RecipeDetailSerializer(
             recipes, many=True, context={'request': request})
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return obj.author.recipe.all().count()
-
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
     """Сериализатор для добавления рецепта в список покупок."""
@@ -313,7 +435,8 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         return serializer.data
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedRepresentationMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для ингредиентов."""
 
     class Meta:
@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from api.middleware import record_query
+from api.pagination import invalidate_counts
+from api.response_cache import invalidate_catalog, invalidate_recipes
+from api.snapshots import tags_snapshot
+from recipes.images import schedule_derivatives
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Follow
+
+User = get_user_model()
+AUTHOR_FIELDS = {'username', 'first_name', 'last_name', 'email'}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+@receiver(post_delete, sender=User)
+def invalidate_pagination_counts(sender, **kwargs):
+    invalidate_counts()
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_counts(sender, created, **kwargs):
+    if created:
+        invalidate_counts()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags_snapshot(sender, **kwargs):
+    tags_snapshot.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def generate_image_derivatives(sender, instance, update_fields, **kwargs):
+    """
+    Копии создаются для новой картинки или если их еще нет: Recipe.save
+    передает в update_fields все поля, поэтому смена картинки
+    определяется по значению, загруженному из базы.
+    """
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    if instance.image and (instance.image_changed()
+                           or not instance.variants_ready()):
+        name = instance.image.name
+        transaction.on_commit(lambda: schedule_derivatives(name))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_response(sender, instance, **kwargs):
+    invalidate_recipes([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_related_recipe_response(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags_response(sender, instance, action, reverse,
+                                    pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_recipes([instance.pk])
+    elif pk_set:
+        invalidate_recipes(pk_set)
+    else:
+        invalidate_catalog()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalog_responses(sender, **kwargs):
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(sender, instance, created, update_fields,
+                                **kwargs):
+    if created or (update_fields is not None
+                   and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    invalidate_recipes(
+        instance.recipe.values_list('id', flat=True).iterator())
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
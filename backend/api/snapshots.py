@@ -0,0 +1,114 @@
+import gzip
+import hashlib
+
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from api.serializers import IngredientSerializer, TagSerializer
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, Tag
+
+
+class CatalogSnapshot:
+    """
+    Готовый JSON справочника и его gzip-вариант в памяти процесса.
+    Снимок пересобирается только при смене версии в кеше,
+    ETag вычисляется по содержимому.
+    """
+
+    def __init__(self, name, queryset, serializer_class, get_version=None,
+                 aget_version=None):
+        self.version_key = f'snapshot:{name}:version'
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        if get_version is not None:
+            self.get_version = get_version
+        if aget_version is not None:
+            self.aget_version = aget_version
+        self._state = None
+
+    def get_version(self):
+        return cache.get_or_set(self.version_key, uuid4().hex, timeout=None)
+
+    async def aget_version(self):
+        return await cache.aget_or_set(
+            self.version_key, uuid4().hex, timeout=None)
+
+    def invalidate(self):
+        """Версия меняется после коммита, как у индекса ингредиентов."""
+        transaction.on_commit(self.bump_version)
+
+    def bump_version(self):
+        cache.set(self.version_key, uuid4().hex, timeout=None)
+        self._state = None
+
+    def make_state(self, version, objects):
+        data = self.serializer_class(objects, many=True).data
+        body = JSONRenderer().render(data)
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        self._state = (version, etag, body, gzip.compress(body, mtime=0))
+        return self._state
+
+    def build(self, version):
+        return self.make_state(version, self.queryset.all())
+
+    async def abuild(self, version):
+        return self.make_state(
+            version, [obj async for obj in self.queryset.all()])
+
+    def get_state(self):
+        version = self.get_version()
+        state = self._state
+        if state is None or state[0] != version:
+            state = self.build(version)
+        return state
+
+    async def aget_state(self):
+        """Версия берется из кеша, снимок пересобирается async ORM."""
+        version = await self.aget_version()
+        state = self._state
+        if state is None or state[0] != version:
+            state = await self.abuild(version)
+        return state
+
+    def response(self, request):
+        return self.make_response(request, self.get_state())
+
+    async def aresponse(self, request):
+        return self.make_response(request, await self.aget_state())
+
+    @staticmethod
+    def accepts(request):
+        """
+        Снимок - готовый JSON: для браузерного рендера (?format=api,
+        Accept: text/html) вьюсет отдает обычный ответ DRF.
+        """
+        return request.accepted_renderer.format == 'json'
+
+    @staticmethod
+    def make_response(request, state):
+        _, etag, body, compressed = state
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in etags or etag in etags:
+            response = HttpResponseNotModified()
+        elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+            response = HttpResponse(compressed,
+                                    content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+tags_snapshot = CatalogSnapshot('tags', Tag.objects.all(), TagSerializer)
+ingredients_snapshot = CatalogSnapshot(
+    'ingredients', Ingredient.objects.order_by('id'), IngredientSerializer,
+    get_version=ingredient_index.get_version,
+    aget_version=ingredient_index.aget_version)
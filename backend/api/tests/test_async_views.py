@@ -0,0 +1,83 @@
+import json
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TestCase
+
+from api import async_views
+from api.response_cache import recipe_response_cache
+from api.snapshots import ingredients_snapshot, tags_snapshot
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+def sync_call(*args, **kwargs):
+    raise AssertionError('Синхронный вызов кеша в асинхронном представлении.')
+
+
+class AsyncViewsCacheTest(TestCase):
+    """Асинхронные представления читают версии из кеша без sync-вызовов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='password')
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Суп', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+        Tag.objects.create(name='Обед', color='#00FF00', slug='lunch')
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+        patchers = [
+            mock.patch('api.response_cache.get_versions', sync_call),
+            mock.patch('api.pagination.get_count_version', sync_call),
+            mock.patch.object(ingredient_index, 'get_version', sync_call),
+            mock.patch.object(tags_snapshot, 'get_version', sync_call),
+            mock.patch.object(ingredients_snapshot, 'get_version',
+                              sync_call),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def get(self, view, path, **kwargs):
+        response = await view(self.factory.get(path), **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    async def test_recipes(self):
+        for _ in range(2):
+            data = await self.get(async_views.recipe_list, '/api/recipes/')
+            self.assertEqual(data['count'], 1)
+            data = await self.get(
+                async_views.recipe_detail,
+                f'/api/recipes/{self.recipe.pk}/', pk=self.recipe.pk)
+            self.assertEqual(data['name'], 'Суп')
+
+    async def test_recipe_detail_pk_normalized(self):
+        with mock.patch.object(
+                recipe_response_cache, 'make_detail_key',
+                wraps=recipe_response_cache.make_detail_key) as make_key:
+            data = await self.get(
+                async_views.recipe_detail,
+                f'/api/recipes/0{self.recipe.pk}/', pk=f'0{self.recipe.pk}')
+        self.assertEqual(data['name'], 'Суп')
+        self.assertEqual(make_key.call_args.args[1], self.recipe.pk)
+
+    async def test_catalog(self):
+        data = await self.get(async_views.tag_list, '/api/tags/')
+        self.assertEqual([tag['slug'] for tag in data], ['lunch'])
+        data = await self.get(async_views.ingredient_list,
+                              '/api/ingredients/')
+        self.assertEqual([item['name'] for item in data], ['соль'])
+        data = await self.get(async_views.ingredient_list,
+                              '/api/ingredients/?name=со')
+        self.assertEqual([item['name'] for item in data], ['соль'])
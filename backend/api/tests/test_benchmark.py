@@ -0,0 +1,38 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from api.benchmark import ENDPOINTS, compare, run, seed
+
+
+class BenchmarkTest(TestCase):
+    """
+    Короткий прогон бенчмарка на маленьком наборе данных: все эндпоинты
+    отвечают без ошибок, а compare находит регрессии.
+    Полный прогон: python manage.py benchmark_api.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.params = seed(users=4, recipes=20, ingredients=20,
+                          ingredients_per_recipe=3, favorites=2, cart=2,
+                          follows=2)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_run(self):
+        for cold in (True, False):
+            with self.subTest(cold=cold):
+                results = run(self.params, iterations=2, warmup=1, cold=cold)
+                self.assertEqual(set(results),
+                                 {name for name, *_ in ENDPOINTS})
+                for name, result in results.items():
+                    self.assertLess(max(result['statuses']), 400, name)
+                self.assertEqual(compare(results, results), [])
+
+    def test_compare(self):
+        baseline = {'recipes-list': {'queries': 5, 'p95_ms': 10.0}}
+        self.assertEqual(compare(
+            {'recipes-list': {'queries': 5, 'p95_ms': 10.5}}, baseline), [])
+        self.assertEqual(len(compare(
+            {'recipes-list': {'queries': 6, 'p95_ms': 20.0}}, baseline)), 2)
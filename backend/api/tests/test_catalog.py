@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from api.snapshots import tags_snapshot
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, Tag
+
+
+class IngredientIndexTest(TestCase):
+    """Версия индекса ингредиентов меняется только после коммита."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_version_rotates_on_commit(self):
+        version = ingredient_index.get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='соль', measurement_unit='г')
+            self.assertEqual(ingredient_index.get_version(), version)
+        self.assertNotEqual(ingredient_index.get_version(), version)
+        self.assertEqual(ingredient_index.search('сол'), [{
+            'id': Ingredient.objects.get().id, 'name': 'соль',
+            'measurement_unit': 'г'}])
+
+
+class TagsSnapshotTest(TestCase):
+    """Снимок тегов пересобирается под новой версией после коммита."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_version_rotates_on_commit(self):
+        version = tags_snapshot.get_version()
+        self.assertEqual(self.client.get('/api/tags/').json(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Завтрак', color='#E26C2D',
+                               slug='breakfast')
+            self.assertEqual(tags_snapshot.get_version(), version)
+        self.assertNotEqual(tags_snapshot.get_version(), version)
+        self.assertEqual(
+            [tag['slug'] for tag in self.client.get('/api/tags/').json()],
+            ['breakfast'])
+
+
+class SnapshotResponseTest(TestCase):
+    """Условные запросы и браузерный рендер справочников."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_if_none_match(self):
+        for url in ('/api/tags/', '/api/ingredients/'):
+            etag = self.client.get(url)['ETag']
+            for header in (etag, '*', f'"other", {etag}'):
+                with self.subTest(url=url, header=header):
+                    response = self.client.get(
+                        url, headers={'If-None-Match': header})
+                    self.assertEqual(response.status_code, 304)
+            self.assertEqual(self.client.get(
+                url, headers={'If-None-Match': '"other"'}).status_code, 200)
+
+    def test_browsable_api(self):
+        for url in ('/api/tags/', '/api/ingredients/'):
+            for kwargs in ({'data': {'format': 'api'}},
+                           {'headers': {'Accept': 'text/html'}}):
+                with self.subTest(url=url, **kwargs):
+                    response = self.client.get(url, **kwargs)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertTrue(
+                        response['Content-Type'].startswith('text/html'))
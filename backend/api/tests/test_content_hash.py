@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.content_hash import get_content_hash
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+class LegacyDuplicateTest(TestCase):
+    """Дубликат с пустым хэшем можно править, не меняя его содержимого."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='password')
+        cls.tag = Tag.objects.create(name='Обед', color='#00FF00',
+                                     slug='lunch')
+        cls.ingredient = Ingredient.objects.create(name='соль',
+                                                   measurement_unit='г')
+        cls.original, cls.duplicate = [
+            Recipe.objects.create(
+                author=cls.author, name='Суп', text=f'Описание {index}',
+                image='recipes/test.png', cooking_time=10)
+            for index in range(2)
+        ]
+        Recipe.objects.filter(pk=cls.duplicate.pk).update(
+            text='Описание 0', content_hash=None)
+        for recipe in (cls.original, cls.duplicate):
+            recipe.tags.add(cls.tag)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=cls.ingredient, amount=5)
+
+    def test_save_keeps_empty_hash(self):
+        recipe = Recipe.objects.get(pk=self.duplicate.pk)
+        recipe.cooking_time = 20
+        recipe.full_clean()
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.cooking_time, 20)
+        self.assertIsNone(recipe.content_hash)
+
+    def test_save_fills_hash_of_new_content(self):
+        recipe = Recipe.objects.get(pk=self.duplicate.pk)
+        recipe.text = 'Новое описание'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.content_hash,
+                         get_content_hash('Суп', 'Новое описание'))
+
+    def test_api_update(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.patch(
+            f'/api/recipes/{self.duplicate.pk}/', {
+                'cooking_time': 20,
+                'tags': [self.tag.id],
+                'ingredients': [{'id': self.ingredient.id, 'amount': 7}],
+            }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            Recipe.objects.get(pk=self.duplicate.pk).cooking_time, 20)
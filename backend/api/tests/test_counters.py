@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    """Счетчики избранного и рецептов совпадают с числом строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@example.com',
+                first_name='Имя', last_name='Фамилия', password='password')
+            for index in range(2)
+        ]
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.users[1], name=f'Рецепт {index}',
+                text=f'Описание {index}', image='recipes/test.png',
+                cooking_time=10)
+            for index in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def assertCounts(self, favorites_count, recipes_count):
+        self.assertEqual(
+            list(Recipe.objects.order_by('id').values_list(
+                'favorites_count', flat=True)), favorites_count)
+        self.assertEqual(
+            list(User.objects.order_by('id').values_list(
+                'recipes_count', flat=True)), recipes_count)
+
+    def test_favorite_add_remove(self):
+        self.assertCounts([0, 0], [0, 2])
+        url = f'/api/recipes/{self.recipes[0].id}/favorite/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertCounts([1, 0], [0, 2])
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertCounts([0, 0], [0, 2])
+
+    def test_recipe_delete(self):
+        Favorite.objects.create(user=self.users[0], recipe=self.recipes[0])
+        Favorite.objects.create(user=self.users[0], recipe=self.recipes[1])
+        self.recipes[0].delete()
+        self.assertCounts([1], [0, 1])
+
+    def test_user_delete_cascade(self):
+        for user in self.users:
+            Favorite.objects.create(user=user, recipe=self.recipes[0])
+        self.users[0].delete()
+        self.assertCounts([1, 0], [2])
+        self.users[1].delete()
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_recompute_counters(self):
+        Favorite.objects.create(user=self.users[0], recipe=self.recipes[0])
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(
+            favorites_count=5)
+        User.objects.filter(pk=self.users[1].pk).update(recipes_count=0)
+        stdout = StringIO()
+        call_command('recompute_counters', '--batch-size', '1',
+                     stdout=stdout)
+        self.assertCounts([1, 0], [0, 2])
+        self.assertIn('исправлено: 1', stdout.getvalue())
@@ -0,0 +1,169 @@
+import base64
+
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from api.fields import Base64ImageField, ImageVariantsField
+from recipes.images import get_variant_names, mark_derivatives_ready
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+class Base64ImageFieldTest(SimpleTestCase):
+    """Картинка декодируется частями, в том числе из base64 с переносами."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), '#E26C2D').save(buffer, 'PNG')
+        cls.image = buffer.getvalue()
+
+    def decode(self, encoded):
+        field = Base64ImageField()
+        field.chunk_size = 50
+        return field.to_internal_value(
+            f'data:image/png;base64,{encoded}')
+
+    def test_single_line(self):
+        file = self.decode(base64.b64encode(self.image).decode())
+        self.assertEqual(file.read(), self.image)
+
+    def test_mime_line_breaks(self):
+        for separator in ('\n', '\r\n'):
+            encoded = base64.encodebytes(self.image).decode().replace(
+                '\n', separator)
+            with self.subTest(separator=separator):
+                file = self.decode(encoded)
+                self.assertEqual(file.read(), self.image)
+
+    def test_invalid_characters(self):
+        encoded = base64.b64encode(self.image).decode()
+        for broken in (encoded[:100] + '!' + encoded[101:], encoded[:-1]):
+            with self.subTest(broken=broken[-10:]):
+                with self.assertRaises(ValidationError):
+                    self.decode(broken)
+
+
+def encode_png(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), '#E26C2D').save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class Base64ImageLimitsTest(TestCase):
+    """Слишком большие картинки отклоняются с ошибкой 400."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='password')
+        cls.tag = Tag.objects.create(name='Обед', color='#00FF00',
+                                     slug='lunch')
+        cls.ingredient = Ingredient.objects.create(name='соль',
+                                                   measurement_unit='г')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def assertImageError(self, image, code):
+        response = self.client.post('/api/recipes/', {
+            'name': 'Суп', 'text': 'Описание', 'cooking_time': 10,
+            'tags': [self.tag.id],
+            'ingredients': [{'id': self.ingredient.id, 'amount': 5}],
+            'image': image,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error.code for error in response.data['image']],
+                         [code])
+        self.assertFalse(Recipe.objects.exists())
+
+    @override_settings(BASE64_IMAGE_MAX_ENCODED_SIZE=100)
+    def test_encoded_too_large(self):
+        self.assertImageError(encode_png(100, 100), 'encoded_too_large')
+
+    @override_settings(BASE64_IMAGE_MAX_SIZE=100)
+    def test_too_large(self):
+        self.assertImageError(encode_png(100, 100), 'too_large')
+
+    @override_settings(BASE64_IMAGE_MAX_PIXELS=10_000)
+    def test_too_many_pixels(self):
+        self.assertImageError(encode_png(101, 100), 'too_many_pixels')
+
+
+class ImageVariantsFieldTest(TestCase):
+    """Ссылки на копии строятся без обращения к хранилищу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='password')
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+
+    def get_urls(self):
+        with mock.patch.object(default_storage, 'exists') as exists:
+            urls = ImageVariantsField().to_representation(
+                Recipe.objects.get(pk=self.recipe.pk).image)
+        exists.assert_not_called()
+        return urls
+
+    def test_original_until_ready(self):
+        self.assertEqual(set(self.get_urls().values()),
+                         {'/media/recipes/test.png'})
+
+    def test_variants_when_ready(self):
+        cache.clear()
+        url = f'/api/recipes/{self.recipe.pk}/'
+        original = self.client.get(url).json()['image_variants']
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_derivatives_ready('recipes/test.png')
+        self.assertNotEqual(
+            self.client.get(url).json()['image_variants'], original)
+        self.assertEqual(self.get_urls(), {
+            variant: f'/media/{name}' for variant, name
+            in get_variant_names('recipes/test.png').items()})
+
+
+class DerivativesSchedulingTest(TestCase):
+    """Копии ставятся в очередь только для новой картинки или без копий."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='password')
+
+    def save(self, recipe):
+        with mock.patch('api.signals.schedule_derivatives') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe.save()
+        return [call.args[0] for call in schedule.call_args_list]
+
+    def test_scheduling(self):
+        recipe = Recipe(author=self.author, name='Суп', text='Описание',
+                        image='recipes/test.png', cooking_time=10)
+        self.assertEqual(self.save(recipe), ['recipes/test.png'])
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.name = 'Борщ'
+        self.assertEqual(self.save(recipe), ['recipes/test.png'])
+        mark_derivatives_ready('recipes/test.png')
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.name = 'Щи'
+        self.assertEqual(self.save(recipe), [])
+        recipe.image = 'recipes/other.png'
+        self.assertEqual(self.save(recipe), ['recipes/other.png'])
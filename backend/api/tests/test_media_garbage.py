@@ -0,0 +1,65 @@
+import tempfile
+
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from recipes.models import Recipe
+from recipes.storage import content_addressed_storage
+
+User = get_user_model()
+
+
+class CollectMediaGarbageTest(TestCase):
+    """Файл, на который сослались после обхода, не удаляется."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='password')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.storage = content_addressed_storage
+        self.names = [
+            self.storage.save(f'recipes/{index}.png',
+                              ContentFile(f'image {index}'.encode()))
+            for index in range(2)
+        ]
+
+    def collect(self):
+        call_command('collect_media_garbage', '--min-age', '0',
+                     stdout=StringIO())
+
+    def test_unreferenced_removed(self):
+        Recipe.objects.create(
+            author=self.author, name='Суп', text='Описание',
+            image=self.names[0], cooking_time=10)
+        self.collect()
+        self.assertTrue(self.storage.exists(self.names[0]))
+        self.assertFalse(self.storage.exists(self.names[1]))
+
+    def test_referenced_after_walk_kept(self):
+        get_modified_time = self.storage.get_modified_time
+
+        def upload(name):
+            # Загрузка того же содержимого во время обхода.
+            if name == self.names[1]:
+                Recipe.objects.create(
+                    author=self.author, name='Суп', text='Описание',
+                    image=name, cooking_time=10)
+            return get_modified_time(name)
+
+        with mock.patch.object(self.storage, 'get_modified_time', upload):
+            self.collect()
+        self.assertFalse(self.storage.exists(self.names[0]))
+        self.assertTrue(self.storage.exists(self.names[1]))
@@ -0,0 +1,83 @@
+import re
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+
+User = get_user_model()
+
+SERVER_TIMING_ENTRY = re.compile(r'(\w+);(?:desc="[^"]*";)?dur=([\d.]+)')
+
+
+class ServerTimingTest(TestCase):
+    """Заголовок Server-Timing разделяет SQL, сериализацию и рендер."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='password')
+        for index in range(3):
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {index}', text='Описание',
+                image='recipes/test.png', cooking_time=10)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_timings(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return {name: float(duration) for name, duration
+                in SERVER_TIMING_ENTRY.findall(response['Server-Timing'])}
+
+    def test_serialization_entry(self):
+        for path in ('/api/recipes/', '/api/users/'):
+            with self.subTest(path=path):
+                timings = self.get_timings(path)
+                self.assertEqual(
+                    set(timings), {'db', 'serialize', 'render', 'total'})
+                self.assertGreater(timings['serialize'], 0)
+                self.assertLess(timings['serialize'], timings['total'])
+
+
+class FileRenderTimeTest(TestCase):
+    """Время рендера файлов списка покупок попадает в метрики."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='password')
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Суп', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+        RecipeIngredient.objects.create(
+            recipe=recipe, amount=5, ingredient=Ingredient.objects.create(
+                name='соль', measurement_unit='г'))
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_download(self):
+        self.client.force_authenticate(self.user)
+        with mock.patch('api.exports.add_render_time') as add_render_time:
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/?format=txt')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('соль', response.content.decode())
+        add_render_time.assert_called_once()
+
+    def test_error_rendered_by_file_renderer(self):
+        with mock.patch('api.renderers.add_render_time') as add_render_time:
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/?format=txt')
+        self.assertEqual(response.status_code, 401)
+        add_render_time.assert_called_once()
@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe
+
+User = get_user_model()
+
+
+class CachedCountTest(TestCase):
+    """Закешированный COUNT общий для пользователей и сбрасывается."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@example.com',
+                first_name='Имя', last_name='Фамилия', password='password')
+            for index in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def test_subscribe_resets_subscriptions_count(self):
+        url = '/api/users/subscriptions/'
+        self.assertEqual(self.client.get(url).data['count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/users/{self.users[1].id}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_new_user_resets_users_count(self):
+        self.assertEqual(self.client.get('/api/users/').data['count'], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(
+                username='new', email='new@example.com', first_name='Имя',
+                last_name='Фамилия', password='password')
+        self.assertEqual(self.client.get('/api/users/').data['count'], 3)
+
+    def test_count_shared_between_users(self):
+        Recipe.objects.create(
+            author=self.users[1], name='Суп', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+        counts = []
+        for user in self.users:
+            client = APIClient()
+            client.force_authenticate(user)
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(
+                    client.get('/api/recipes/').data['count'], 1)
+            counts.append(sum('COUNT(' in query['sql']
+                              for query in context.captured_queries))
+        self.assertEqual(counts, [1, 0])
+
+    def test_count_per_user_for_user_filters(self):
+        recipe = Recipe.objects.create(
+            author=self.users[1], name='Суп', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+        Favorite.objects.create(user=self.users[0], recipe=recipe)
+        url = '/api/recipes/?is_favorited=1'
+        self.assertEqual(self.client.get(url).data['count'], 1)
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        self.assertEqual(client.get(url).data['count'], 0)
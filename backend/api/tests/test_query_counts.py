@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+LIMITS = (2, 6)
+
+
+class QueryCountTest(TestCase):
+    """Число запросов эндпоинтов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@example.com',
+                first_name='Имя', last_name='Фамилия', password='password')
+            for index in range(8)
+        ]
+        tags = [Tag.objects.create(name=f'Тег {index}', color=f'#00000{index}',
+                                   slug=f'tag{index}')
+                for index in range(3)]
+        ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {index}',
+                                      measurement_unit='г')
+            for index in range(5)
+        ]
+        for index in range(12):
+            recipe = Recipe.objects.create(
+                author=cls.users[index % len(cls.users)],
+                name=f'Рецепт {index}', text=f'Описание {index}',
+                image='recipes/test.png', cooking_time=10)
+            recipe.tags.set(tags[:index % len(tags) + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=index + 1)
+                for ingredient in ingredients[:index % 4 + 2])
+            if index % 2:
+                Favorite.objects.create(user=cls.users[0], recipe=recipe)
+            if index % 3:
+                ShoppingCart.objects.create(user=cls.users[0], recipe=recipe)
+        cls.recipe = recipe
+        for author in cls.users[1:]:
+            Follow.objects.create(follower=cls.users[0], author=author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def assertQueriesForLimits(self, url, num):
+        for limit in LIMITS:
+            cache.clear()
+            with self.subTest(limit=limit), self.assertNumQueries(num):
+                response = self.client.get(url, {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_recipe_list(self):
+        self.assertQueriesForLimits('/api/recipes/', 6)
+
+    def test_recipe_detail(self):
+        cache.clear()
+        with self.assertNumQueries(5):
+            response = self.client.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_subscriptions(self):
+        self.assertQueriesForLimits('/api/users/subscriptions/', 4)
+
+    def test_subscriptions_recipes_limit(self):
+        for limit in LIMITS:
+            cache.clear()
+            with self.subTest(limit=limit), self.assertNumQueries(4):
+                response = self.client.get(
+                    '/api/users/subscriptions/',
+                    {'limit': 2, 'recipes_limit': limit})
+                self.assertEqual(response.status_code, 200)
+
+    def test_users(self):
+        self.assertQueriesForLimits('/api/users/', 3)
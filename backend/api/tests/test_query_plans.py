@@ -0,0 +1,80 @@
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from api.views import get_recipe_queryset, get_subscriptions_queryset
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.query_plans import get_explain, get_hot_queries
+from users.models import Follow
+
+User = get_user_model()
+
+
+@skipIf(get_explain() is None, 'EXPLAIN не поддерживается для этой базы.')
+class QueryPlansTest(TestCase):
+    """Запросы вьюсетов, включая prefetch, не сканируют таблицы целиком."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@example.com',
+                first_name='Имя', last_name='Фамилия', password='password')
+            for index in range(4)
+        ]
+        cls.tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                     slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(name='соль',
+                                                   measurement_unit='г')
+        for index in range(8):
+            recipe = Recipe.objects.create(
+                author=cls.users[index % 4], name=f'Рецепт {index}',
+                text='Описание', image='recipes/test.png', cooking_time=10)
+            recipe.tags.add(cls.tag)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=cls.ingredient, amount=5)
+            Favorite.objects.create(user=cls.users[0], recipe=recipe)
+            ShoppingCart.objects.create(user=cls.users[0], recipe=recipe)
+        for author in cls.users[1:]:
+            Follow.objects.create(follower=cls.users[0], author=author)
+
+    def assertIndexedPlans(self, queryset):
+        """Выполняет queryset и проверяет план каждого его SELECT."""
+        statements = []
+
+        def collect(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(collect):
+            list(queryset)
+        explain = get_explain()
+        for sql, params in statements:
+            if not sql.startswith('SELECT'):
+                continue
+            plan, scans = explain(sql, params)
+            self.assertEqual(scans, [], f'{sql}\n{plan}')
+
+    def test_recipe_queryset(self):
+        user = self.users[0]
+        recipes = get_recipe_queryset(user)
+        for queryset in (recipes, recipes.filter(author=self.users[1]),
+                         recipes.filter(tags__slug='breakfast')):
+            with self.subTest(sql=str(queryset.query)[-80:]):
+                self.assertIndexedPlans(queryset[:6])
+
+    def test_subscriptions_queryset(self):
+        for recipes_limit in (None, '3'):
+            with self.subTest(recipes_limit=recipes_limit):
+                self.assertIndexedPlans(get_subscriptions_queryset(
+                    self.users[0], recipes_limit)[:6])
+
+    def test_hot_queries(self):
+        for title, queryset in get_hot_queries(
+                user_id=self.users[0].id, ingredient_id=self.ingredient.id,
+                slug='breakfast', limit=6).items():
+            with self.subTest(title=title):
+                self.assertIndexedPlans(queryset)
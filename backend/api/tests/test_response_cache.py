@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class RecipeDetailCacheTest(TestCase):
+    """Кеш карточки рецепта сбрасывается при любом написании id."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='password')
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Суп', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_leading_zero_invalidated(self):
+        url = f'/api/recipes/0{self.recipe.pk}/'
+        self.assertEqual(self.client.get(url).data['name'], 'Суп')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Борщ'
+            self.recipe.save()
+        self.assertEqual(self.client.get(url).data['name'], 'Борщ')
+        self.assertEqual(
+            self.client.get(f'/api/recipes/{self.recipe.pk}/').data['name'],
+            'Борщ')
+
+    def test_not_a_number(self):
+        self.assertEqual(
+            self.client.get('/api/recipes/abc/').status_code, 404)
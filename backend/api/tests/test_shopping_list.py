@@ -0,0 +1,201 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.shopping_cart import get_cart_version
+
+User = get_user_model()
+
+
+class ShoppingListTest(TestCase):
+    """Сводный список покупок совпадает с корзинами после любых правок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@example.com',
+                first_name='Имя', last_name='Фамилия', password='password')
+            for index in range(2)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {index}',
+                                      measurement_unit='г')
+            for index in range(3)
+        ]
+        cls.tag = Tag.objects.create(name='Обед', color='#00FF00',
+                                     slug='lunch')
+        cls.recipes = []
+        for index in range(2):
+            recipe = Recipe.objects.create(
+                author=cls.users[1], name=f'Рецепт {index}',
+                text=f'Описание {index}', image='recipes/test.png',
+                cooking_time=10)
+            recipe.tags.add(cls.tag)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=10 * (index + 1))
+                for ingredient in cls.ingredients[:2])
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def assertListMatchesCarts(self):
+        self.assertEqual(
+            {(item.user_id, item.ingredient_id): item.total_amount
+             for item in ShoppingListItem.objects.all()},
+            ShoppingListItem.objects.aggregate_totals())
+
+    def test_api_cart(self):
+        for recipe in self.recipes:
+            response = self.client.post(
+                f'/api/recipes/{recipe.id}/shopping_cart/')
+            self.assertEqual(response.status_code, 201)
+        self.assertListMatchesCarts()
+        self.assertEqual(ShoppingListItem.objects.get(
+            user=self.users[0], ingredient=self.ingredients[0]
+        ).total_amount, 30)
+        response = self.client.delete(
+            f'/api/recipes/{self.recipes[0].id}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self.assertListMatchesCarts()
+
+    def test_api_recipe_update(self):
+        ShoppingCart.objects.create(user=self.users[0],
+                                    recipe=self.recipes[0])
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        response = client.patch(
+            f'/api/recipes/{self.recipes[0].id}/', {
+                'tags': [self.tag.id],
+                'ingredients': [
+                    {'id': self.ingredients[1].id, 'amount': 5},
+                    {'id': self.ingredients[2].id, 'amount': 7},
+                ],
+            }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertListMatchesCarts()
+
+    def test_cart_outside_api(self):
+        cart = ShoppingCart.objects.create(user=self.users[0],
+                                           recipe=self.recipes[0])
+        ShoppingCart.objects.create(user=self.users[1],
+                                    recipe=self.recipes[0])
+        self.assertListMatchesCarts()
+        cart.delete()
+        self.assertListMatchesCarts()
+
+    def test_recipe_ingredients_outside_api(self):
+        for user in self.users:
+            ShoppingCart.objects.create(user=user, recipe=self.recipes[0])
+        item = RecipeIngredient.objects.create(
+            recipe=self.recipes[0], ingredient=self.ingredients[2],
+            amount=3)
+        self.assertListMatchesCarts()
+        item.amount = 8
+        item.save()
+        self.assertListMatchesCarts()
+        item.recipe = self.recipes[1]
+        item.save()
+        self.assertListMatchesCarts()
+        item.delete()
+        self.assertListMatchesCarts()
+
+    def test_cascade_deletes(self):
+        for recipe in self.recipes:
+            ShoppingCart.objects.create(user=self.users[0], recipe=recipe)
+            ShoppingCart.objects.create(user=self.users[1], recipe=recipe)
+        self.recipes[0].delete()
+        self.assertListMatchesCarts()
+        self.ingredients[0].delete()
+        self.assertListMatchesCarts()
+        self.users[1].delete()
+        self.assertListMatchesCarts()
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+    def test_add_amounts_on_conflict(self):
+        ShoppingListItem.objects.create(
+            user=self.users[0], ingredient=self.ingredients[0],
+            total_amount=4)
+        ShoppingListItem.objects.add_amounts([
+            ShoppingListItem(user=self.users[0],
+                             ingredient=self.ingredients[0], total_amount=6),
+            ShoppingListItem(user=self.users[0],
+                             ingredient=self.ingredients[1], total_amount=2),
+        ])
+        self.assertEqual(dict(ShoppingListItem.objects.values_list(
+            'ingredient_id', 'total_amount')), {
+            self.ingredients[0].id: 10, self.ingredients[1].id: 2})
+
+    def test_cart_version_rotates_on_commit(self):
+        version = get_cart_version(self.users[0].id)
+        with self.captureOnCommitCallbacks(execute=True):
+            ShoppingCart.objects.create(user=self.users[0],
+                                        recipe=self.recipes[0])
+            self.assertEqual(get_cart_version(self.users[0].id), version)
+        self.assertNotEqual(get_cart_version(self.users[0].id), version)
+
+
+class RecipeUpdateQueriesTest(TestCase):
+    """Число запросов PATCH не зависит от числа удаленных ингредиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='password')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(22))
+        cls.tag = Tag.objects.create(name='Обед', color='#00FF00',
+                                     slug='lunch')
+        cls.recipes = []
+        for index in range(2):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {index}',
+                text=f'Описание {index}', image='recipes/test.png',
+                cooking_time=10)
+            recipe.tags.add(cls.tag)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=10)
+                for ingredient in cls.ingredients)
+            user = User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@example.com',
+                first_name='Имя', last_name='Фамилия', password='password')
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def patch(self, recipe, kept):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                f'/api/recipes/{recipe.id}/', {
+                    'tags': [self.tag.id],
+                    'ingredients': [
+                        {'id': ingredient.id, 'amount': 10}
+                        for ingredient in self.ingredients[:kept]],
+                }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return len(context.captured_queries)
+
+    def test_removed_ingredients(self):
+        self.assertEqual(self.patch(self.recipes[0], 20),
+                         self.patch(self.recipes[1], 2))
+        self.assertEqual(
+            {(item.user_id, item.ingredient_id): item.total_amount
+             for item in ShoppingListItem.objects.all()},
+            ShoppingListItem.objects.aggregate_totals())
+        self.assertEqual(ShoppingListItem.objects.count(), 22)
@@ -0,0 +1,75 @@
+import json
+import tempfile
+
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes import transfer
+from recipes.content_hash import get_content_hash
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+class ImportChunkTest(TestCase):
+    """Загрузка рецептов из JSONL."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='password')
+        Tag.objects.create(name='Обед', color='#00FF00', slug='lunch')
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+
+    def get_line(self, name):
+        return json.dumps({
+            'author': self.author.email, 'name': name, 'text': 'Описание',
+            'cooking_time': 10, 'pub_date': '2024-01-01T00:00:00+00:00',
+            'image': 'recipes/test.png', 'tags': ['lunch'],
+            'ingredients': [{'name': 'соль', 'measurement_unit': 'г',
+                             'amount': 5}],
+        })
+
+    def test_duplicate_from_other_chunk(self):
+        save_records = transfer.save_records
+
+        def save_after_other_chunk(*args):
+            if not Recipe.objects.filter(name='Суп').exists():
+                Recipe.objects.create(
+                    author=self.author, name='Суп', text='Описание',
+                    image='recipes/test.png', cooking_time=10)
+            return save_records(*args)
+
+        with mock.patch.object(transfer, 'save_records',
+                               side_effect=save_after_other_chunk):
+            created, skipped = transfer.import_chunk(
+                [self.get_line('Суп'), self.get_line('Каша')])
+        self.assertEqual((created, skipped), (1, 1))
+        self.assertEqual(
+            Recipe.objects.get(name='Каша').content_hash,
+            get_content_hash('Каша', 'Описание'))
+        self.assertEqual(Recipe.objects.get(name='Суп').ingredients.count(),
+                         0)
+
+    def test_command_resets_cached_responses(self):
+        cache.clear()
+        Recipe.objects.create(
+            author=self.author, name='Суп', text='Описание',
+            image='recipes/test.png', cooking_time=10)
+        self.assertEqual(self.client.get('/api/recipes/').json()['count'], 1)
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as file:
+            file.write(self.get_line('Каша') + '\n')
+            file.flush()
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('import_recipes', file.name, workers=1,
+                             stdout=StringIO())
+        response = self.client.get('/api/recipes/').json()
+        self.assertEqual(response['count'], 2)
+        self.assertIn('Каша',
+                      [recipe['name'] for recipe in response['results']])
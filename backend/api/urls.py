@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
 from .views import (FollowViewSet, IngredientViewSet, RecipeViewSet,
                     TagsViewSet, UsersViewSet)
 
@@ -22,7 +24,16 @@ router.register('ingredients',
                 IngredientViewSet,
                 basename='Ingredient')
 
+async_urlpatterns = [
+    path('recipes/', async_views.recipe_list),
+    path('recipes/<int:pk>/', async_views.recipe_detail),
+    path('tags/', async_views.tag_list),
+    path('ingredients/', async_views.ingredient_list),
+    path('users/subscriptions/', async_views.subscriptions),
+]
+
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
+    *(async_urlpatterns if settings.ASYNC_VIEWS else []),
     path('', include(router.urls),),
 ]
@@ -1,22 +1,33 @@
+from functools import partial
+
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import Http404, HttpResponse
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
+from api.exports import FILENAMES, render_shopping_cart
 from api.filters import IngredientFilter, RecipeFilter
 from api.permissions import IsOwnerOrReadOnly
+from api.renderers import (CSVFileRenderer, JSONFileRenderer, PDFFileRenderer,
+                           PlainTextFileRenderer)
+from api.response_cache import recipe_response_cache
 from api.serializers import (FavoriteCreateSerializer, FollowCreateSerializer,
                              FollowReadSerializer, IngredientSerializer,
                              RecipeCreateSerializer, RecipeSerializer,
                              ShoppingCartSerializer, TagSerializer,
                              UserSerializer)
+from api.snapshots import ingredients_snapshot, tags_snapshot
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
 from users.models import Follow
@@ -24,64 +35,175 @@ from users.models import Follow
 User = get_user_model()
 
 
-class UsersViewSet(DjoserUserViewSet):
+def load_subscriptions(user, author_ids):
+    """Возвращает множество id авторов, на которых подписан user."""
+    if not user.is_authenticated or not author_ids:
+        return set()
+    return set(Follow.objects.filter(
+        follower=user, author__in=author_ids
+    ).values_list('author_id', flat=True))
+
+
+def get_subscriptions_queryset(user, recipes_limit=None):
+    """Подписки user с авторами и превью их последних рецептов."""
+    recipes = Recipe.objects.only(
+        'id', 'name', 'image', 'variants_image_name', 'cooking_time',
+        'author_id', 'pub_date'
+    ).order_by('-pub_date', '-id')
+    if recipes_limit and recipes_limit.isdigit():
+        recipes = recipes[:int(recipes_limit)]
+    return Follow.objects.filter(
+        follower=user
+    ).select_related('author').prefetch_related(
+        Prefetch('author__recipe', queryset=recipes,
+                 to_attr='recipes_preview')
+    ).order_by('id')
+
+
+async def aload_subscriptions(user, author_ids):
+    """Асинхронный вариант load_subscriptions."""
+    if not user.is_authenticated or not author_ids:
+        return set()
+    return {author_id async for author_id in Follow.objects.filter(
+        follower=user, author__in=author_ids
+    ).values_list('author_id', flat=True)}
+
+
+def get_recipe_id(value):
+    """
+    id рецепта из URL числом: '05' и '5' должны давать один ключ кеша,
+    иначе ответ под '05' не сбрасывается при изменении рецепта.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise NotFound('No Recipe matches the given query.')
+
+
+def get_recipe_queryset(user):
+    """Рецепты со связанными данными и флагами для user."""
+    return Recipe.objects.order_by('-pub_date', '-id').select_related(
+        'author').prefetch_related(
+        'tags',
+        Prefetch('recipeingredient',
+                 queryset=RecipeIngredient.objects.select_related(
+                     'ingredient')),
+    ).with_user_flags(user)
+
+
+class SubscriptionsContextMixin:
+    """
+    Добавляет в контекст сериализатора подписки текущего пользователя
+    на авторов отображаемых объектов одним запросом на страницу.
+    """
+
+    def get_author_id(self, obj):
+        return obj.author_id
+
+    def get_subscriptions_context(self, instance, many=False):
+        context = self.get_serializer_context()
+        objs = instance if many else [instance]
+        context['subscriptions'] = load_subscriptions(
+            self.request.user, {self.get_author_id(obj) for obj in objs})
+        return context
+
+    def get_serializer(self, *args, **kwargs):
+        if args and args[0] is not None and 'context' not in kwargs:
+            kwargs['context'] = self.get_subscriptions_context(
+                args[0], many=kwargs.get('many', False))
+        return super().get_serializer(*args, **kwargs)
+
+
+class UsersViewSet(SubscriptionsContextMixin, DjoserUserViewSet):
     """Вьюсет для просмотра и редактирования данных пользователей."""
     serializer_class = UserSerializer
     queryset = DjoserUserViewSet.queryset
 
     def get_permissions(self):
-        if self.action == 'me':
+        if self.action in ('me', 'subscriptions'):
             return [IsAuthenticated()]
         return super().get_permissions()
 
+    def get_author_id(self, obj):
+        return obj.pk
+
     @action(detail=False, methods=['get'], url_path='subscriptions')
     def subscriptions(self, request, *args, **kwargs):
-        queryset = Follow.objects.filter(
-            follower=self.request.user).prefetch_related('author__recipe')
+        queryset = get_subscriptions_queryset(
+            request.user, request.query_params.get('recipes_limit'))
         paginated_queryset = self.paginate_queryset(queryset)
+        context = self.get_serializer_context()
+        context['subscriptions'] = load_subscriptions(
+            request.user, {obj.author_id for obj in paginated_queryset})
         serializer = FollowReadSerializer(
-            paginated_queryset, many=True, context={'request': request})
+            paginated_queryset, many=True, context=context)
         return self.get_paginated_response(serializer.data)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SubscriptionsContextMixin, viewsets.ModelViewSet):
     """Вьюсет для рецептов."""
 
-    queryset = Recipe.objects.all().order_by('-pub_date')
+    queryset = Recipe.objects.all().order_by('-pub_date', '-id')
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,
                           IsOwnerOrReadOnly)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        return get_recipe_queryset(self.request.user)
+
     def get_serializer_class(self):
         if self.action in ('create', 'update', 'partial_update'):
             return RecipeCreateSerializer
         return RecipeSerializer
 
+    def cached_response(self, key, get_response):
+        """Для анонимов отдает данные ответа из кеша, если они есть."""
+        data = recipe_response_cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = get_response()
+        if response.status_code == status.HTTP_200_OK:
+            recipe_response_cache.set(key, response.data)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(
+            recipe_response_cache.get_list_key(request),
+            partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().retrieve(request, *args, **kwargs)
+        return self.cached_response(
+            recipe_response_cache.get_detail_key(
+                request, get_recipe_id(kwargs[self.lookup_field])),
+            partial(super().retrieve, request, *args, **kwargs))
+
     @action(detail=False, methods=['get'],
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            renderer_classes=[PlainTextFileRenderer, CSVFileRenderer,
+                              JSONFileRenderer, PDFFileRenderer])
     def download_shopping_cart(self, request):
-        shopping_cart = ShoppingCart.objects.filter(
-            user=self.request.user).values('recipe')
-        items = RecipeIngredient.objects.filter(
-            recipe__in=shopping_cart).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(
-            total_amount=Sum('amount')
-        ).order_by('ingredient__name')
-
-        text = ['Список покупок' + '\n' + '\n']
-        for item in items:
-            text.append(f"- {item['ingredient__name']} "
-                        f"({item['ingredient__measurement_unit']}): "
-                        f"{item['total_amount']}\n")
+        renderer = request.accepted_renderer
+        content = render_shopping_cart(request.user, renderer.format)
+        if content is None:
+            response = JsonResponse(
+                {'detail': 'Файл готовится, повторите запрос позже.'},
+                status=status.HTTP_202_ACCEPTED,
+                json_dumps_params={'ensure_ascii': False})
+            response['Retry-After'] = 2
+            return response
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
         response = HttpResponse(
-            content_type='text/plain', status=status.HTTP_200_OK)
-        response['Content-Disposition'] = ('attachment; '
-                                           'filename=shopping_cart.txt')
-        response.writelines(text)
+            content, content_type=content_type, status=status.HTTP_200_OK)
+        response['Content-Disposition'] = (
+            f'attachment; filename={FILENAMES[renderer.format]}')
         return response
 
     def add_to_collection(self, request, pk=None,
@@ -116,13 +238,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'],
             permission_classes=[IsAuthenticated])
+    @transaction.atomic
     def shopping_cart(self, request, pk=None):
         return self.add_to_collection(
             request, pk=pk, serializer_class=ShoppingCartSerializer)
 
     @shopping_cart.mapping.delete
+    @transaction.atomic
     def remove_from_shopping_cart(self, request, pk=None):
-        return self.remove_from_collection(request, pk=pk, model=ShoppingCart)
+        return self.remove_from_collection(
+            request, pk=pk, model=ShoppingCart)
 
 
 class TagsViewSet(viewsets.ModelViewSet):
@@ -136,6 +261,11 @@ class TagsViewSet(viewsets.ModelViewSet):
     http_method_names = ['get']
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        if not tags_snapshot.accepts(request):
+            return super().list(request, *args, **kwargs)
+        return tags_snapshot.response(request)
+
 
 class BaseViewset(viewsets.ModelViewSet):
     """Набор базовых представлений для управления"""
@@ -172,9 +302,20 @@ class FollowViewSet(BaseViewset):
     model = Follow
     user_model = User
 
+    @cached_property
+    def subscriptions(self):
+        return load_subscriptions(
+            self.request.user, [self.kwargs.get('user_id')])
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['subscriptions'] = self.subscriptions
+        return context
+
     def perform_create(self, serializer):
         author = self._get_user()
         serializer.save(author=author)
+        self.subscriptions.add(author.id)
 
     def create(self, request, *args, **kwargs):
         author = self._get_user()
@@ -183,7 +324,7 @@ class FollowViewSet(BaseViewset):
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
         read_serializer = FollowReadSerializer(
-            serializer.instance, context={'request': request})
+            serializer.instance, context=serializer.context)
         headers = self.get_success_headers(read_serializer.data)
         return Response(
             read_serializer.data, status=status.HTTP_201_CREATED,
@@ -197,6 +338,8 @@ class FollowViewSet(BaseViewset):
             author=author, follower=self.request.user)
         if model_items.exists():
             model_items.first().delete()
+            if 'subscriptions' in vars(self):
+                self.subscriptions.discard(author.id)
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             'Объект не существует.', status=status.HTTP_400_BAD_REQUEST)
@@ -220,3 +363,11 @@ class IngredientViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     filterset_fields = ('name',)
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name:
+            return Response(ingredient_index.search(name))
+        if not ingredients_snapshot.accepts(request):
+            return super().list(request, *args, **kwargs)
+        return ingredients_snapshot.response(request)
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -92,10 +93,46 @@ else:
             'USER': os.getenv('POSTGRES_USER', default='postgres'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
             'HOST': os.getenv('DB_HOST', default='db'),
-            'PORT': os.getenv('DB_PORT', default='5432')
+            'PORT': os.getenv('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
         }
     }
 
+# wsgi - синхронный gunicorn, asgi - uvicorn-воркеры и асинхронные
+# представления для горячих GET-эндпоинтов (api/async_views.py).
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+ASYNC_VIEWS = SERVER_MODE == 'asgi'
+
+# Одновременных запросов к базе на процесс в режиме asgi: воркеры
+# умноженные на это число не должны превышать max_connections базы.
+ASYNC_DB_CONCURRENCY = int(os.getenv('ASYNC_DB_CONCURRENCY', 10))
+
+# Запросы дольше этого порога пишутся в лог api.timing
+# вместе с повторяющимися SQL-запросами.
+SLOW_REQUEST_THRESHOLD_MS = int(os.getenv('SLOW_REQUEST_THRESHOLD_MS', 500))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.timing': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Версии кешей сбрасываются сигналами, поэтому при нескольких процессах
+# нужен общий бэкенд: файловый кеш, memcached или redis.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -122,6 +159,10 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageLimitPagination',
     'PAGE_SIZE': 10,
 }
@@ -132,6 +173,18 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+BASE64_IMAGE_MAX_SIZE = int(
+    os.getenv('BASE64_IMAGE_MAX_SIZE', 10 * 1024 * 1024))
+
+BASE64_IMAGE_MAX_ENCODED_SIZE = BASE64_IMAGE_MAX_SIZE * 4 // 3 + 4
+
+BASE64_IMAGE_MAX_PIXELS = int(
+    os.getenv('BASE64_IMAGE_MAX_PIXELS', 40_000_000))
+
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
+IMAGE_VARIANT_QUALITY = 80
+
 DJOSER = {
     'SERIALIZERS': {
         'user': 'api.serializers.UserSerializer',
@@ -157,6 +210,15 @@ SHOPPING_CART_FILENAME = 'user-shopping-cart.pdf'
 
 SHOPPING_CART_FILE = 'shopping-cart.pdf'
 
+SHOPPING_CART_CACHE_TIMEOUT = int(
+    os.getenv('SHOPPING_CART_CACHE_TIMEOUT', 60 * 60))
+
+SHOPPING_CART_RENDER_WORKERS = int(
+    os.getenv('SHOPPING_CART_RENDER_WORKERS', 2))
+
+SHOPPING_CART_FONT = os.getenv(
+    'SHOPPING_CART_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
 CORS_URLS_REGEX = r'^/api/.*$'
 
 CORS_ALLOWED_ORIGINS = []
@@ -166,3 +228,13 @@ for host in ALLOWED_HOSTS:
 
 
 PAGE_SIZE = 10
+
+PAGINATION_COUNT_TIMEOUT = int(os.getenv('PAGINATION_COUNT_TIMEOUT', 30))
+
+PAGINATION_COUNT_ESTIMATE = os.getenv(
+    'PAGINATION_COUNT_ESTIMATE', 'False') == 'True'
+
+PAGINATION_COUNT_CAP = int(os.getenv('PAGINATION_COUNT_CAP', 1000))
+
+RECIPE_RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_RESPONSE_CACHE_TIMEOUT', 24 * 60 * 60))
@@ -0,0 +1,38 @@
+import multiprocessing
+import os
+import sys
+
+from django.conf import settings
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+# Кеш в памяти процесса у каждого воркера свой: сброс версий в одном
+# воркере не виден остальным, и они отдают устаревшие ответы.
+PROCESS_LOCAL_CACHES = {'django.core.cache.backends.locmem.LocMemCache'}
+SHARED_CACHE = (settings.CACHES['default']['BACKEND']
+                not in PROCESS_LOCAL_CACHES)
+
+# SERVER_MODE=asgi запускает uvicorn-воркеры с асинхронными
+# представлениями, иначе - синхронные потоковые воркеры WSGI.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+bind = os.getenv('GUNICORN_BIND', '0:8000')
+workers = int(os.getenv(
+    'GUNICORN_WORKERS',
+    multiprocessing.cpu_count() * 2 + 1 if SHARED_CACHE else 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+    worker_class = 'gthread'
+    threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+
+def on_starting(server):
+    if server.cfg.workers > 1 and not SHARED_CACHE:
+        sys.exit('Несколько воркеров требуют общего кеша: задайте '
+                 'CACHE_BACKEND (например, RedisCache) '
+                 'или GUNICORN_WORKERS=1.')
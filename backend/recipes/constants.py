@@ -2,3 +2,4 @@ RECIPE_MODELS_MAX_LENGTH = 200
 TAG_MAX_LEN = 200
 MIN_COOKING_TIME = 1
 MIN_AMOUNT_INGREDIENTS = 1
+CONTENT_HASH_LENGTH = 64
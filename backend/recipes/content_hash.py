@@ -0,0 +1,12 @@
+import hashlib
+
+
+def normalize(value):
+    """Регистр и пробельные символы не влияют на сравнение рецептов."""
+    return ' '.join(value.split()).casefold()
+
+
+def get_content_hash(name, text):
+    """sha256 нормализованных названия и описания рецепта."""
+    content = f'{normalize(name)}\n{normalize(text)}'
+    return hashlib.sha256(content.encode()).hexdigest()
@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe
+
+User = get_user_model()
+
+
+def change_favorites_count(recipe_id, delta):
+    """Атомарно меняет счетчик добавлений рецепта в избранное."""
+    Recipe.objects.filter(
+        pk=recipe_id, favorites_count__gte=-delta
+    ).update(favorites_count=F('favorites_count') + delta)
+
+
+def change_recipes_count(user_id, delta):
+    """Атомарно меняет счетчик рецептов автора."""
+    User.objects.filter(
+        pk=user_id, recipes_count__gte=-delta
+    ).update(recipes_count=F('recipes_count') + delta)
+
+
+def count_subquery(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField()), 0)
+
+
+def recompute_favorites_count(recipe_ids):
+    """Пересчитывает favorites_count. Возвращает число исправленных."""
+    actual = count_subquery(Favorite.objects.all(), 'recipe')
+    return Recipe.objects.filter(pk__in=recipe_ids).annotate(
+        actual=actual
+    ).filter(~Q(favorites_count=F('actual'))).update(favorites_count=actual)
+
+
+def recompute_recipes_count(user_ids):
+    """Пересчитывает recipes_count. Возвращает число исправленных."""
+    actual = count_subquery(Recipe.objects.all(), 'author')
+    return User.objects.filter(pk__in=user_ids).annotate(
+        actual=actual
+    ).filter(~Q(recipes_count=F('actual'))).update(recipes_count=actual)
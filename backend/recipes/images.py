@@ -0,0 +1,110 @@
+import logging
+import os
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from PIL import Image
+
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = 'recipes/derivatives'
+VARIANTS = {
+    'card': (480, 480),
+    'thumbnail': (160, 160),
+}
+WEBP = 'WEBP'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_variant_names(name, source_format=None):
+    """
+    Имена производных изображения: {'card': ..., 'card_webp': ...}.
+    Формат исходника берется из расширения его имени.
+    """
+    stem, ext = os.path.splitext(os.path.basename(name))
+    ext = (source_format or ext.lstrip('.')).lower()
+    names = {}
+    for variant in VARIANTS:
+        names[variant] = f'{DERIVATIVES_DIR}/{stem}_{variant}.{ext}'
+        names[f'{variant}_webp'] = f'{DERIVATIVES_DIR}/{stem}_{variant}.webp'
+    return names
+
+
+def save_variant(image, name, image_format):
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=settings.IMAGE_VARIANT_QUALITY)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def generate_derivatives(name, force=False):
+    """Создает уменьшенные копии изображения в исходном формате и WebP."""
+    names = get_variant_names(name)
+    if not force and all(default_storage.exists(variant_name)
+                         for variant_name in names.values()):
+        return 0
+    created = 0
+    with default_storage.open(name) as file, Image.open(file) as image:
+        image.load()
+        source_format = image.format
+        for variant, size in VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail(size)
+            save_variant(resized, names[variant], source_format)
+            save_variant(resized, names[f'{variant}_webp'], WEBP)
+            created += 2
+    return created
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS)
+        return _executor
+
+
+def mark_derivatives_ready(name):
+    """
+    Отмечает, что копии картинки name созданы. Рецепты сохраняются
+    по одному, чтобы сигналы сбросили закешированные ответы с ссылками
+    на оригинал.
+    """
+    for recipe in Recipe.objects.filter(image=name).exclude(
+            variants_image_name=name):
+        recipe.variants_image_name = name
+        recipe.save(update_fields=('variants_image_name',))
+
+
+def derivatives_done(name, future):
+    """Вызывается в потоке пула процессов после генерации копий."""
+    error = future.exception()
+    if error is not None:
+        logger.error('Не удалось создать копии %s: %s', name, error)
+        return
+    try:
+        mark_derivatives_ready(name)
+    finally:
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def schedule_derivatives(name):
+    """Ставит генерацию производных в пул процессов."""
+    future = get_executor().submit(generate_derivatives, name)
+    future.add_done_callback(partial(derivatives_done, name))
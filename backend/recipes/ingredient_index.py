@@ -0,0 +1,101 @@
+from bisect import bisect_left
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """
+    Отсортированный индекс ингредиентов в памяти процесса
+    для поиска по началу и вхождению названия без запросов к базе.
+    Версия индекса хранится в кеше, поэтому сброс в одном процессе
+    приводит к перестроению индекса и в остальных.
+    """
+
+    version_key = 'ingredients:index-version'
+
+    def __init__(self):
+        self._state = None
+
+    def invalidate(self):
+        """
+        Меняет версию после коммита транзакции: иначе параллельный запрос
+        успел бы собрать под новой версией индекс из старых данных.
+        """
+        transaction.on_commit(self.bump_version)
+
+    def bump_version(self):
+        cache.set(self.version_key, uuid4().hex, timeout=None)
+        self._state = None
+
+    def get_version(self):
+        return cache.get_or_set(self.version_key, uuid4().hex, timeout=None)
+
+    async def aget_version(self):
+        return await cache.aget_or_set(
+            self.version_key, uuid4().hex, timeout=None)
+
+    @staticmethod
+    def get_rows():
+        return Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit')
+
+    def make_state(self, version, rows):
+        entries = sorted(
+            (name.casefold(), pk, name, unit) for pk, name, unit in rows)
+        keys = [entry[0] for entry in entries]
+        self._state = (version, keys, entries)
+        return self._state
+
+    def build(self, version):
+        return self.make_state(version, self.get_rows())
+
+    async def abuild(self, version):
+        return self.make_state(
+            version, [row async for row in self.get_rows()])
+
+    def get_state(self):
+        version = self.get_version()
+        state = self._state
+        if state is None or state[0] != version:
+            state = self.build(version)
+        return state
+
+    async def aget_state(self):
+        version = await self.aget_version()
+        state = self._state
+        if state is None or state[0] != version:
+            state = await self.abuild(version)
+        return state
+
+    def search(self, query):
+        """
+        Возвращает ингредиенты, название которых начинается с query,
+        а за ними - содержащие query, в алфавитном порядке.
+        """
+        return self.search_state(self.get_state(), query)
+
+    async def asearch(self, query):
+        return self.search_state(await self.aget_state(), query)
+
+    @staticmethod
+    def search_state(state, query):
+        query = query.casefold()
+        _, keys, entries = state
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        prefix = entries[start:end]
+        contains = [entry for entry in entries[:start] + entries[end:]
+                    if query in entry[0]]
+        return [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, pk, name, unit in prefix + contains
+        ]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,111 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from api.benchmark import compare, run, seed
+
+BENCHMARK_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'benchmark'},
+}
+
+
+class Command(BaseCommand):
+    """
+    Бенчмарк эндпоинтов API на воспроизводимом наборе данных.
+    Данные создаются во временной тестовой базе, рабочая база и кеш
+    не затрагиваются.
+    """
+
+    help = ('Измеряет задержки и SQL-запросы эндпоинтов API '
+            'и сравнивает их с прошлым прогоном.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Избранных рецептов на пользователя.')
+        parser.add_argument('--cart', type=int, default=10,
+                            help='Рецептов в корзине на пользователя.')
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Подписок на пользователя.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Не очищать кеш между итерациями, '
+                                 'по умолчанию он очищается.')
+        parser.add_argument('--output', help='JSON-файл для результатов.')
+        parser.add_argument('--baseline',
+                            help='JSON-файл прошлого прогона для сравнения.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый относительный рост p95.')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help='Рост p95 меньше этого не считается '
+                                 'регрессией.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['recipes'] < options['users']:
+            raise CommandError('Нужно не меньше двух пользователей '
+                               'и рецептов не меньше, чем пользователей.')
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должно быть положительным.')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        dataset = {
+            name: options[name] for name in (
+                'users', 'recipes', 'ingredients', 'ingredients_per_recipe',
+                'favorites', 'cart', 'follows')
+        }
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                params = seed(random_seed=options['seed'], **dataset)
+                results = run(params, iterations=options['iterations'],
+                              warmup=options['warmup'],
+                              cold=not options['warm_cache'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:32} p50 {result["p50_ms"]:8.2f} '
+                f'p95 {result["p95_ms"]:8.2f} '
+                f'p99 {result["p99_ms"]:8.2f} мс, '
+                f'запросов {result["queries"]:3}, '
+                f'SQL {result["sql_ms"]:.2f} мс, '
+                f'статусы {result["statuses"]}')
+        failed = [name for name, result in results.items()
+                  if max(result['statuses']) >= 400]
+        if failed:
+            self.stdout.write(self.style.WARNING(
+                'Ошибочные ответы: ' + ', '.join(failed)))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({'dataset': dataset,
+                           'warm_cache': options['warm_cache'],
+                           'endpoints': results},
+                          file, ensure_ascii=False, indent=2)
+        if baseline is None:
+            return
+        if baseline.get('dataset') != dataset:
+            self.stdout.write(self.style.WARNING(
+                'Размер данных отличается от прошлого прогона.'))
+        regressions = compare(
+            results, baseline['endpoints'], options['threshold'],
+            options['min_delta_ms'])
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
@@ -0,0 +1,48 @@
+from statistics import median
+from time import perf_counter
+
+from django.core.management import BaseCommand
+
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    """Сравнение поиска ингредиентов через базу и через индекс в памяти."""
+
+    help = 'Сравнивает поиск ингредиентов по name через базу и индекс.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--prefix-length', type=int, default=2)
+
+    def handle(self, *args, **options):
+        length = options['prefix_length']
+        queries = sorted({
+            name[:length] for name in Ingredient.objects.values_list(
+                'name', flat=True) if len(name) >= length
+        })
+        if not queries:
+            self.stdout.write(self.style.WARNING('Нет ингредиентов.'))
+            return
+        ingredient_index.get_state()
+
+        def database_search(query):
+            return list(Ingredient.objects.filter(
+                name__istartswith=query).values(
+                'id', 'name', 'measurement_unit'))
+
+        for title, search in (('База данных', database_search),
+                              ('Индекс', ingredient_index.search)):
+            timings = []
+            for _ in range(options['repeat']):
+                for query in queries:
+                    start = perf_counter()
+                    search(query)
+                    timings.append(perf_counter() - start)
+            timings.sort()
+            self.stdout.write(
+                f'{title}: запросов {len(timings)}, '
+                f'медиана {median(timings) * 1000:.3f} мс, '
+                f'p95 {timings[int(len(timings) * 0.95)] * 1000:.3f} мс'
+            )
@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from time import perf_counter
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management import BaseCommand, CommandError
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?page=2',
+    '/api/tags/',
+    '/api/ingredients/?name=%D0%B0',
+)
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочное сравнение запущенных серверов в режимах wsgi и asgi
+    на горячих GET-эндпоинтах при разной конкурентности.
+    """
+
+    help = ('Сравнивает пропускную способность и задержки '
+            'WSGI- и ASGI-серверов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Эндпоинт, можно указать несколько раз.')
+        parser.add_argument('--concurrency', default='1,10,50',
+                            help='Уровни конкурентности через запятую.')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на каждый уровень.')
+        parser.add_argument('--token', help='Токен для авторизованных '
+                                            'запросов.')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in
+                      options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency: ожидаются целые числа.')
+        if options['requests'] < 1 or min(levels) < 1:
+            raise CommandError('Число запросов и потоков должно быть '
+                               'положительным.')
+        headers = {'Accept': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        paths = options['paths'] or DEFAULT_PATHS
+
+        def fetch(url):
+            start = perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers),
+                             timeout=options['timeout']) as response:
+                    response.read()
+                    ok = response.status < 400
+            except (HTTPError, URLError, OSError):
+                ok = False
+            return perf_counter() - start, ok
+
+        for mode in ('wsgi', 'asgi'):
+            base_url = options[f'{mode}_url'].rstrip('/')
+            urls = [base_url + path for path in paths]
+            fetch(urls[0])
+            for level in levels:
+                batch = islice(cycle(urls), options['requests'])
+                start = perf_counter()
+                with ThreadPoolExecutor(max_workers=level) as executor:
+                    results = list(executor.map(fetch, batch))
+                elapsed = perf_counter() - start
+                timings = sorted(timing for timing, _ in results)
+                errors = sum(not ok for _, ok in results)
+                self.stdout.write(
+                    f'{mode} c={level}: '
+                    f'{len(results) / elapsed:.1f} запр/с, '
+                    f'p50 {timings[len(timings) // 2] * 1000:.1f} мс, '
+                    f'p95 {timings[int(len(timings) * 0.95)] * 1000:.1f} мс, '
+                    f'ошибок {errors}'
+                )
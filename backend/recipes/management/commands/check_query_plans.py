@@ -0,0 +1,45 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.query_plans import get_explain, get_hot_queries
+
+
+class Command(BaseCommand):
+    """
+    Проверка планов горячих запросов на рабочей базе.
+    Запросы самих вьюсетов проверяет тест api.tests.test_query_plans.
+    """
+
+    help = ('Выполняет EXPLAIN для горячих запросов и завершается '
+            'с ошибкой, если какой-то из них сканирует таблицу целиком.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Печатать планы целиком.')
+
+    def handle(self, *args, **options):
+        explain = get_explain()
+        if explain is None:
+            raise CommandError(
+                f'База {connection.vendor} не поддерживается.')
+        queries = get_hot_queries(
+            user_id=1, ingredient_id=1, slug='breakfast',
+            limit=options['limit'])
+        failed = []
+        for title, queryset in queries.items():
+            sql, params = queryset.query.sql_with_params()
+            plan, scans = explain(sql, params)
+            if options['verbose_plans']:
+                self.stdout.write(plan)
+            if scans:
+                failed.append(title)
+                self.stdout.write(self.style.ERROR(
+                    f'{title}: полное сканирование {", ".join(scans)}'))
+            else:
+                self.stdout.write(f'{title}: OK')
+        if failed:
+            raise CommandError(
+                f'Запросы без подходящих индексов: {", ".join(failed)}.')
+        self.stdout.write(self.style.SUCCESS('Все запросы идут по индексам.'))
@@ -0,0 +1,85 @@
+import posixpath
+
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.images import DERIVATIVES_DIR, VARIANTS, get_variant_names
+from recipes.models import Recipe
+from recipes.storage import content_addressed_storage
+
+
+class Command(BaseCommand):
+    """Удаление картинок рецептов, на которые больше нет ссылок."""
+
+    help = 'Удаляет файлы в media/recipes/, не используемые рецептами.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только вывести файлы, которые будут удалены.')
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе этого числа секунд.')
+
+    def walk(self, storage, directory):
+        directories, files = storage.listdir(directory)
+        for name in files:
+            yield posixpath.join(directory, name)
+        for subdirectory in directories:
+            yield from self.walk(
+                storage, posixpath.join(directory, subdirectory))
+
+    @staticmethod
+    def get_stem(name):
+        """Имя исходника без расширения: у копий отрезается суффикс."""
+        stem = posixpath.splitext(posixpath.basename(name))[0]
+        if posixpath.dirname(name) == DERIVATIVES_DIR:
+            base, _, variant = stem.rpartition('_')
+            if variant in VARIANTS:
+                return base
+        return stem
+
+    def is_referenced(self, name):
+        """
+        Повторная проверка перед удалением: загрузка, попавшая на уже
+        существующий файл, могла сослаться на него после обхода.
+        Строки рецептов с тем же хэшем блокируются до конца транзакции.
+        """
+        images = Recipe.objects.select_for_update().filter(
+            image__contains=self.get_stem(name)).values_list(
+            'image', flat=True)
+        return any(
+            name == image or name in get_variant_names(image).values()
+            for image in images)
+
+    def handle(self, *args, **options):
+        storage = content_addressed_storage
+        referenced = set()
+        for name in Recipe.objects.exclude(image='').values_list(
+                'image', flat=True).iterator():
+            referenced.add(name)
+            referenced.update(get_variant_names(name).values())
+        threshold = timezone.now() - timedelta(seconds=options['min_age'])
+        removed = 0
+        if not storage.exists('recipes'):
+            self.stdout.write('Каталог recipes/ пуст.')
+            return
+        for name in self.walk(storage, 'recipes'):
+            if name in referenced:
+                continue
+            if storage.get_modified_time(name) > threshold:
+                continue
+            if options['dry_run']:
+                self.stdout.write(name)
+                removed += 1
+                continue
+            with transaction.atomic():
+                if self.is_referenced(name):
+                    continue
+                storage.delete(name)
+            removed += 1
+        action = 'К удалению' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{action} файлов: {removed}.'))
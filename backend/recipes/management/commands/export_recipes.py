@@ -0,0 +1,40 @@
+import json
+import sys
+
+from django.core.management import BaseCommand
+from django.db.models import Prefetch
+
+from recipes.models import Recipe, RecipeIngredient
+from recipes.transfer import recipe_to_record
+
+
+class Command(BaseCommand):
+    """Выгрузка рецептов в JSONL."""
+
+    help = 'Выгружает рецепты с тегами и ингредиентами в JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки, по умолчанию stdout.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch('recipeingredient',
+                     queryset=RecipeIngredient.objects.select_related(
+                         'ingredient')),
+        ).order_by('id')
+        output = (sys.stdout if options['path'] == '-'
+                  else open(options['path'], 'w', encoding='utf-8'))
+        count = 0
+        try:
+            for recipe in recipes.iterator(chunk_size=options['chunk_size']):
+                output.write(json.dumps(
+                    recipe_to_record(recipe), ensure_ascii=False) + '\n')
+                count += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(f'Выгружено рецептов: {count}.'))
@@ -0,0 +1,41 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from recipes.images import generate_derivatives, mark_derivatives_ready
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Создание уменьшенных копий для уже загруженных картинок рецептов."""
+
+    help = 'Создает уменьшенные копии и WebP для картинок рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать уже существующие копии.')
+        parser.add_argument(
+            '--workers', type=int, default=settings.IMAGE_VARIANT_WORKERS)
+
+    def handle(self, *args, **options):
+        names = sorted(set(
+            Recipe.objects.exclude(image='').values_list('image', flat=True)))
+        created = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {
+                name: executor.submit(
+                    generate_derivatives, name, options['force'])
+                for name in names
+            }
+            for name, future in futures.items():
+                try:
+                    created += future.result()
+                    mark_derivatives_ready(name)
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {len(names)}, создано копий: {created}, '
+            f'ошибок: {failed}.'))
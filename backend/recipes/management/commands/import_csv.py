@@ -1,33 +1,141 @@
 import csv
 
+from io import StringIO
+from itertools import islice
+from time import perf_counter
+
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from recipes.constants import RECIPE_MODELS_MAX_LENGTH
+from recipes.ingredient_index import ingredient_index
 from recipes.models import Ingredient
 
+STAGING_TABLE = 'ingredient_import'
+
 
 class Command(BaseCommand):
-    """Скрипт импорта из файла .csv"""
+    """
+    Скрипт импорта из файла .csv.
+    Файл читается потоком, уже существующие ингредиенты пропускаются,
+    поэтому импорт можно запускать повторно.
+    """
 
-    def handle(self, *args, **kwargs):
-        model = Ingredient
-        ingredients = []
+    help = 'Импортирует ингредиенты из csv-файла (название, единица).'
 
-        with open(
-            f'{settings.BASE_DIR}/data/ingredients.csv',
-            newline='',
-            encoding='utf-8'
-        ) as csv_file:
-            reader = csv.reader(csv_file)
-            count = 0
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=f'{settings.BASE_DIR}/data/ingredients.csv')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только проверить файл, ничего не записывая.')
 
-            for row in reader:
-                name, unit = row
-                ingredients.append(model(name=name, measurement_unit=unit))
-                count += 1
+    def handle(self, *args, **options):
+        start = perf_counter()
+        try:
+            csv_file = open(options['path'], newline='', encoding='utf-8')
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть файл: {error}')
+        with csv_file:
+            if options['dry_run']:
+                processed, created = self.validate(
+                    csv_file, options['batch_size']), 0
+            elif connection.vendor == 'postgresql':
+                processed, created = self.copy(
+                    csv_file, options['batch_size'])
+            else:
+                processed, created = self.bulk_insert(
+                    csv_file, options['batch_size'])
+        if created:
+            ingredient_index.invalidate()
+        elapsed = perf_counter() - start
+        self.stdout.write(
+            f'Обработано: {processed} записей, добавлено: {created}, '
+            f'{processed / elapsed if elapsed else processed:.0f} записей/с.')
+        self.stdout.write(self.style.SUCCESS('Данные загружены'))
 
-            model.objects.bulk_create(ingredients)
+    def read_batches(self, csv_file, batch_size):
+        reader = csv.reader(csv_file)
+        while True:
+            batch = []
+            for row in islice(reader, batch_size):
+                if (len(row) != 2
+                        or not all(row)
+                        or max(map(len, row)) > RECIPE_MODELS_MAX_LENGTH):
+                    raise CommandError(
+                        f'Некорректная строка {reader.line_num}: {row}')
+                batch.append(row)
+            if not batch:
+                return
+            yield batch
 
-            print(f'Обработано: {count} записей.')
+    def report(self, processed):
+        self.stdout.write(f'Обработано: {processed} записей...')
 
-        self.stdout.write(self.style.SUCCESS('Данные загружены'))
+    def validate(self, csv_file, batch_size):
+        processed = 0
+        for batch in self.read_batches(csv_file, batch_size):
+            processed += len(batch)
+            self.report(processed)
+        return processed
+
+    @transaction.atomic
+    def bulk_insert(self, csv_file, batch_size):
+        before = Ingredient.objects.count()
+        processed = 0
+        for batch in self.read_batches(csv_file, batch_size):
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in batch),
+                batch_size=batch_size, ignore_conflicts=True)
+            processed += len(batch)
+            self.report(processed)
+        return processed, Ingredient.objects.count() - before
+
+    @transaction.atomic
+    def copy(self, csv_file, batch_size):
+        """
+        COPY во временную таблицу и вставка без конфликтов на Postgres.
+        Строки проверяются и передаются в COPY пачками по batch_size.
+        """
+        table = Ingredient._meta.db_table
+        copy_sql = (f'COPY {STAGING_TABLE} (name, measurement_unit) '
+                    f'FROM STDIN WITH (FORMAT csv)')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE {STAGING_TABLE} '
+                f'(name varchar({RECIPE_MODELS_MAX_LENGTH}), '
+                f'measurement_unit varchar({RECIPE_MODELS_MAX_LENGTH})) '
+                f'ON COMMIT DROP')
+            processed = self.copy_batches(
+                cursor.cursor, copy_sql,
+                self.read_batches(csv_file, batch_size))
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT DISTINCT name, measurement_unit FROM {STAGING_TABLE} '
+                f'ON CONFLICT (name, measurement_unit) DO NOTHING')
+            created = cursor.rowcount
+        return processed, created
+
+    def copy_batches(self, raw_cursor, copy_sql, batches):
+        """COPY через psycopg2 (copy_expert) или psycopg 3 (copy)."""
+        processed = 0
+        if hasattr(raw_cursor, 'copy_expert'):
+            for batch in batches:
+                buffer = StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                raw_cursor.copy_expert(copy_sql, buffer)
+                processed += len(batch)
+                self.report(processed)
+            return processed
+        with raw_cursor.copy(copy_sql) as copy:
+            for batch in batches:
+                for row in batch:
+                    copy.write_row(row)
+                processed += len(batch)
+                self.report(processed)
+        return processed
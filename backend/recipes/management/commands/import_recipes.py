@@ -0,0 +1,92 @@
+import sys
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from time import perf_counter
+
+from django.core.management import BaseCommand
+
+from api.pagination import invalidate_counts
+from api.response_cache import invalidate_recipes
+from recipes.transfer import close_connections, import_chunk
+
+# Пачек в очереди пула на один процесс: файл читается по мере загрузки,
+# а не целиком, как при executor.map.
+CHUNKS_PER_WORKER = 2
+
+
+class Command(BaseCommand):
+    """
+    Загрузка рецептов из JSONL пачками в пуле процессов.
+    Рецепты, уже существующие с тем же названием и описанием,
+    а также ссылающиеся на неизвестных авторов, теги или ингредиенты,
+    пропускаются. Файлы картинок переносятся отдельно.
+    """
+
+    help = 'Загружает рецепты из JSONL, выгруженного export_recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для загрузки, по умолчанию stdin.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число процессов; 1 - загрузка в текущем процессе.')
+
+    def read_chunks(self, source, chunk_size):
+        while True:
+            chunk = list(islice(source, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def handle(self, *args, **options):
+        start = perf_counter()
+        source = (sys.stdin if options['path'] == '-'
+                  else open(options['path'], encoding='utf-8'))
+        created = skipped = 0
+        try:
+            chunks = self.read_chunks(source, options['chunk_size'])
+            if options['workers'] > 1:
+                results = self.import_parallel(chunks, options['workers'])
+            else:
+                results = map(import_chunk, chunks)
+            for chunk_created, chunk_skipped in results:
+                created += chunk_created
+                skipped += chunk_skipped
+                self.report(created, skipped)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if created:
+                # bulk_create не вызывает сигналы: закешированные ленты
+                # и счетчики страниц сбрасываются один раз за загрузку.
+                invalidate_recipes(())
+                invalidate_counts()
+        elapsed = perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {created}, пропущено: {skipped}, '
+            f'{created / elapsed if elapsed else created:.0f} рецептов/с.'))
+
+    def import_parallel(self, chunks, workers):
+        """
+        Загружает пачки в пуле процессов, держа в очереди не больше
+        CHUNKS_PER_WORKER пачек на процесс. Результаты отдаются
+        по мере готовности.
+        """
+        close_connections()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for chunk in chunks:
+                if len(pending) >= workers * CHUNKS_PER_WORKER:
+                    done, pending = wait(
+                        pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(executor.submit(import_chunk, chunk))
+            for future in wait(pending).done:
+                yield future.result()
+
+    def report(self, created, skipped):
+        self.stdout.write(f'Загружено: {created}, пропущено: {skipped}...')
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Пересборка и проверка сводных списков покупок."""
+
+    help = 'Пересобирает или проверяет сводные списки покупок по корзинам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сравнить списки с корзинами, ничего не меняя.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        user_ids = list(User.objects.order_by('id').values_list(
+            'id', flat=True))
+        batch_size = options['batch_size']
+        mismatched = 0
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            if options['verify']:
+                mismatched += self.verify(batch)
+                continue
+            with transaction.atomic():
+                ShoppingListItem.objects.rebuild(batch)
+        if not options['verify']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Списки покупок пересобраны: {len(user_ids)} пользователей.'))
+        elif mismatched:
+            raise CommandError(
+                f'Расхождения в списках покупок: {mismatched} позиций.')
+        else:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+
+    def verify(self, user_ids):
+        expected = ShoppingListItem.objects.aggregate_totals(user_ids)
+        actual = dict(
+            ((user_id, ingredient_id), total)
+            for user_id, ingredient_id, total
+            in ShoppingListItem.objects.filter(
+                user_id__in=user_ids).values_list(
+                'user_id', 'ingredient_id', 'total_amount')
+        )
+        mismatched = 0
+        for key in expected.keys() | actual.keys():
+            if expected.get(key) != actual.get(key):
+                mismatched += 1
+                self.stdout.write(
+                    f'Пользователь {key[0]}, ингредиент {key[1]}: '
+                    f'ожидается {expected.get(key)}, '
+                    f'в списке {actual.get(key)}')
+        return mismatched
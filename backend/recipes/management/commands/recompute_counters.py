@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recompute_favorites_count, recompute_recipes_count
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Исправление расхождений счетчиков favorites_count и recipes_count."""
+
+    help = 'Пересчитывает счетчики избранного и рецептов пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for title, model, recompute in (
+                ('рецептов', Recipe, recompute_favorites_count),
+                ('пользователей', User, recompute_recipes_count)):
+            ids = list(model.objects.order_by('id').values_list(
+                'id', flat=True))
+            fixed = 0
+            batch_size = options['batch_size']
+            for start in range(0, len(ids), batch_size):
+                with transaction.atomic():
+                    fixed += recompute(ids[start:start + batch_size])
+            self.stdout.write(
+                f'Проверено {title}: {len(ids)}, исправлено: {fixed}.')
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны.'))
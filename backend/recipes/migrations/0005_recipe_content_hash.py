@@ -0,0 +1,55 @@
+# Generated by Django 5.0.14 on 2026-10-17 07:26
+
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def get_content_hash(name, text):
+    """
+    Копия recipes.content_hash.get_content_hash на момент миграции:
+    миграция не должна меняться вместе с кодом приложения.
+    """
+    content = '\n'.join(' '.join(value.split()).casefold()
+                        for value in (name, text))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def fill_content_hash(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    seen, batch = set(), []
+    recipes = Recipe.objects.only('id', 'name', 'text').order_by('id')
+    for recipe in recipes.iterator(chunk_size=BATCH_SIZE):
+        content_hash = get_content_hash(recipe.name, recipe.text)
+        if content_hash in seen:
+            continue
+        seen.add(content_hash)
+        recipe.content_hash = content_hash
+        batch.append(recipe)
+        if len(batch) >= BATCH_SIZE:
+            Recipe.objects.bulk_update(batch, ('content_hash',))
+            batch = []
+    Recipe.objects.bulk_update(batch, ('content_hash',))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='content_hash',
+            field=models.CharField(editable=False, help_text='Пустой у дубликатов, созданных до проверки уникальности.', max_length=64, null=True, verbose_name='Хэш содержимого'),
+        ),
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='recipe',
+            name='content_hash',
+            field=models.CharField(editable=False, help_text='Пустой у дубликатов, созданных до проверки уникальности.', max_length=64, null=True, unique=True, verbose_name='Хэш содержимого'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='variants_image_name',
+            field=models.CharField(blank=True, editable=False, help_text='Совпадает с картинкой, когда ее уменьшенные копии созданы.', max_length=100, verbose_name='Картинка с готовыми копиями'),
+        ),
+    ]
@@ -1,13 +1,23 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models import Exists, OuterRef, Sum, Value
 
-from recipes.constants import (MIN_AMOUNT_INGREDIENTS, MIN_COOKING_TIME,
-                               RECIPE_MODELS_MAX_LENGTH, TAG_MAX_LEN)
+from recipes.constants import (CONTENT_HASH_LENGTH, MIN_AMOUNT_INGREDIENTS,
+                               MIN_COOKING_TIME, RECIPE_MODELS_MAX_LENGTH,
+                               TAG_MAX_LEN)
+from recipes.content_hash import get_content_hash
+from recipes.shopping_cart import bump_cart_versions
+from recipes.storage import content_addressed_storage
 
 User = get_user_model()
 
+UPSERT_BATCH_SIZE = 300
+
+RECIPE_SEPARATELY_UPDATED_FIELDS = ('favorites_count', 'variants_image_name')
+
 
 class Tag(models.Model):
 
@@ -64,6 +74,27 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Queryset рецептов с аннотациями для текущего пользователя."""
+
+    def with_user_flags(self, user):
+        """
+        Добавляет флаги is_favorited и is_in_shopping_cart
+        подзапросами Exists, для анонимного пользователя - False.
+        """
+        if not user or not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        )
+
+
 class Recipe(models.Model):
     """Модель рецептов"""
 
@@ -72,6 +103,7 @@ class Recipe(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Автор',
         related_name='recipe',
+        db_index=False,
     )
     name = models.CharField(
         'Название рецепта',
@@ -80,6 +112,7 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Картинка рецепта',
         upload_to='recipes/',
+        storage=content_addressed_storage,
     )
     text = models.TextField(
         'Описание рецепта'
@@ -103,15 +136,100 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False,
+    )
+    content_hash = models.CharField(
+        'Хэш содержимого',
+        max_length=CONTENT_HASH_LENGTH,
+        unique=True,
+        null=True,
+        editable=False,
+        help_text='Пустой у дубликатов, созданных до проверки уникальности.',
+    )
+    variants_image_name = models.CharField(
+        'Картинка с готовыми копиями',
+        max_length=100,
+        blank=True,
+        editable=False,
+        help_text='Совпадает с картинкой, когда ее уменьшенные копии '
+                  'созданы.',
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='recipe_author_pub_date_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_content = (
+            instance.__dict__.get('name'), instance.__dict__.get('text'))
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
+    def content_changed(self):
+        """
+        Изменились ли название или описание после загрузки из базы.
+        Хэш пересчитывается только в этом случае: у дубликатов, созданных
+        до проверки уникальности, он пустой, и правка других полей
+        не должна его заполнять.
+        """
+        return (self._state.adding
+                or getattr(self, '_loaded_content', None)
+                != (self.name, self.text))
+
+    def image_changed(self):
+        """Сменилась ли картинка после загрузки из базы."""
+        return getattr(self, '_loaded_image', None) != self.image.name
+
+    def variants_ready(self):
+        return self.variants_image_name == self.image.name
+
+    def clean(self):
+        if self.content_changed() and Recipe.objects.filter(
+            content_hash=get_content_hash(self.name, self.text)
+        ).exclude(pk=self.pk).exists():
+            raise ValidationError('Такой рецепт уже существует')
+
+    def save(self, *args, **kwargs):
+        """
+        Счетчик favorites_count меняется только атомарными UPDATE,
+        а variants_image_name - только генератором копий, поэтому
+        при сохранении существующего рецепта они не перезаписываются.
+        """
+        content_changed = self.content_changed()
+        if content_changed:
+            self.content_hash = get_content_hash(self.name, self.text)
+        update_fields = kwargs.get('update_fields')
+        if (update_fields is None and not self._state.adding
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in RECIPE_SEPARATELY_UPDATED_FIELDS
+            ]
+        elif update_fields is not None and content_changed and (
+                {'name', 'text'} & set(update_fields)):
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+        self._loaded_content = (self.name, self.text)
+        self._loaded_image = self.image.name
+
 
 class RecipeIngredient(models.Model):
     """Модель кол-ва ингридиетов в рецепте"""
@@ -119,14 +237,15 @@ class RecipeIngredient(models.Model):
         Recipe,
         on_delete=models.CASCADE,
         related_name='recipeingredient',
-        verbose_name='Рецепт'
-
+        verbose_name='Рецепт',
+        db_index=False,
     )
     ingredient = models.ForeignKey(
         Ingredient,
         on_delete=models.CASCADE,
         related_name='recipeingredient',
-        verbose_name='Ингредиент'
+        verbose_name='Ингредиент',
+        db_index=False,
     )
     amount = models.PositiveIntegerField(
         'Количество',
@@ -148,6 +267,10 @@ class RecipeIngredient(models.Model):
                 name='unique_recipe_ingredient'
             ),
         ]
+        indexes = [
+            models.Index(fields=('ingredient', 'recipe', 'amount'),
+                         name='recipeingredient_ingr_idx'),
+        ]
 
 
 class BaseUserRecipeRelation(models.Model):
@@ -155,8 +278,8 @@ class BaseUserRecipeRelation(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        verbose_name='Пользователь'
-
+        verbose_name='Пользователь',
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
@@ -203,3 +326,151 @@ class ShoppingCart(BaseUserRecipeRelation):
 
     def __str__(self) -> str:
         return f'{self.recipe} добавлен в корзину пользователем {self.user}.'
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+    """
+    Операции поддержания сводного списка покупок.
+    Вызываются сигналами (recipes.signals) в той же транзакции,
+    что и изменение корзины или ингредиентов рецепта.
+    """
+
+    @staticmethod
+    def get_recipe_amounts(recipe_id):
+        return dict(RecipeIngredient.objects.filter(
+            recipe_id=recipe_id).values_list('ingredient_id', 'amount'))
+
+    def apply_deltas(self, user_ids, deltas):
+        """Прибавляет deltas {id ингредиента: количество} пользователям."""
+        deltas = {key: value for key, value in deltas.items() if value}
+        user_ids = list(user_ids)
+        if not deltas or not user_ids:
+            return
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in self.select_for_update().filter(
+                user_id__in=user_ids, ingredient_id__in=deltas)
+        }
+        to_create, to_update, to_delete = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, delta in deltas.items():
+                item = items.get((user_id, ingredient_id))
+                if item is None:
+                    if delta > 0:
+                        to_create.append(self.model(
+                            user_id=user_id, ingredient_id=ingredient_id,
+                            total_amount=delta))
+                    continue
+                item.total_amount += delta
+                if item.total_amount > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.pk)
+        self.add_amounts(to_create)
+        self.bulk_update(to_update, ('total_amount',))
+        if to_delete:
+            self.filter(pk__in=to_delete).delete()
+        bump_cart_versions(user_ids)
+
+    def add_amounts(self, items):
+        """
+        Вставляет позиции, а если позицию успела создать параллельная
+        транзакция (select_for_update не блокирует еще не созданные
+        строки), прибавляет количество к ней: INSERT ... ON CONFLICT.
+        """
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        for start in range(0, len(items), UPSERT_BATCH_SIZE):
+            batch = items[start:start + UPSERT_BATCH_SIZE]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (user_id, ingredient_id, '
+                    f'total_amount) VALUES '
+                    + ', '.join(['(%s, %s, %s)'] * len(batch))
+                    + ' ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                    f'SET total_amount = {table}.total_amount '
+                    '+ EXCLUDED.total_amount',
+                    [value for item in batch for value in (
+                        item.user_id, item.ingredient_id, item.total_amount)])
+
+    def add_recipe(self, user_id, recipe_id):
+        self.apply_deltas([user_id], self.get_recipe_amounts(recipe_id))
+
+    def remove_recipe(self, user_id, recipe_id):
+        self.apply_deltas([user_id], {
+            ingredient_id: -amount for ingredient_id, amount
+            in self.get_recipe_amounts(recipe_id).items()})
+
+    def change_recipe(self, recipe_id, old_amounts, new_amounts):
+        """Переносит изменение ингредиентов рецепта во все корзины."""
+        deltas = {
+            ingredient_id: (new_amounts.get(ingredient_id, 0)
+                            - old_amounts.get(ingredient_id, 0))
+            for ingredient_id in {*old_amounts, *new_amounts}
+        }
+        self.apply_deltas(ShoppingCart.objects.filter(
+            recipe_id=recipe_id).values_list('user_id', flat=True), deltas)
+
+    @staticmethod
+    def aggregate_totals(user_ids=None):
+        """Считает итоги по корзинам: {(user_id, ingredient_id): сумма}."""
+        carts = ShoppingCart.objects.all()
+        if user_ids is not None:
+            carts = carts.filter(user_id__in=user_ids)
+        rows = carts.filter(
+            recipe__recipeingredient__isnull=False
+        ).values_list(
+            'user_id', 'recipe__recipeingredient__ingredient_id'
+        ).annotate(
+            total=Sum('recipe__recipeingredient__amount')
+        ).order_by()
+        return {(user_id, ingredient_id): total
+                for user_id, ingredient_id, total in rows}
+
+    def rebuild(self, user_ids):
+        """Пересобирает список покупок пользователей по их корзинам."""
+        self.filter(user_id__in=user_ids).delete()
+        self.bulk_create(
+            self.model(user_id=user_id, ingredient_id=ingredient_id,
+                       total_amount=total)
+            for (user_id, ingredient_id), total
+            in self.aggregate_totals(user_ids).items()
+        )
+        bump_cart_versions(user_ids)
+
+
+class ShoppingListItem(models.Model):
+    """
+    Модель сводного списка покупок: суммарное количество ингредиента
+    по всем рецептам в корзине пользователя.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'shopping_list'
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Списки покупок по ингредиентам'
+        ordering = ('user', 'ingredient')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_user_ingredient')
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.ingredient}: {self.total_amount}'
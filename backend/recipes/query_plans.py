@@ -0,0 +1,75 @@
+import json
+import re
+
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from recipes.models import (Favorite, Recipe, RecipeIngredient, ShoppingCart,
+                            ShoppingListItem)
+from users.models import Follow
+
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\S+)$')
+SQLITE_SUBQUERY = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\S+)$')
+
+
+def get_hot_queries(user_id, ingredient_id, slug, limit):
+    """Запросы горячих эндпоинтов, которые должны идти по индексам."""
+    recipes = Recipe.objects.order_by('-pub_date', '-id')
+    return {
+        'Лента рецептов': recipes[:limit],
+        'Рецепты автора': recipes.filter(author_id=user_id)[:limit],
+        'Рецепты по тегу': recipes.filter(tags__slug=slug)[:limit],
+        'Избранное пользователя': Favorite.objects.filter(user_id=user_id),
+        'Корзина пользователя': ShoppingCart.objects.filter(user_id=user_id),
+        'Сумма корзины': RecipeIngredient.objects.filter(
+            recipe__shoppingcart_relations__user_id=user_id
+        ).values('ingredient_id').annotate(total=Sum('amount')).order_by(),
+        'Рецепты с ингредиентом': RecipeIngredient.objects.filter(
+            ingredient_id=ingredient_id).values('recipe_id'),
+        'Список покупок': ShoppingListItem.objects.filter(user_id=user_id),
+        'Подписки': Follow.objects.filter(
+            follower_id=user_id).order_by('id')[:limit],
+    }
+
+
+def get_explain():
+    """
+    Функция EXPLAIN для текущей базы: возвращает план и таблицы,
+    которые сканируются целиком, или None для неподдерживаемой базы.
+    На Postgres последовательное сканирование запрещается настройкой
+    enable_seqscan, поэтому Seq Scan в плане означает, что подходящего
+    индекса нет. На SQLite ищется SCAN таблицы без индекса.
+    """
+    return {
+        'postgresql': explain_postgresql,
+        'sqlite': explain_sqlite,
+    }.get(connection.vendor)
+
+
+def explain_postgresql(sql, params):
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans, nodes = [], [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            scans.append(node['Relation Name'])
+        nodes.extend(node.get('Plans', ()))
+    return json.dumps(plan, indent=2), scans
+
+
+def explain_sqlite(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        details = [row[-1] for row in cursor.fetchall()]
+    # Подзапросы (CO-ROUTINE, MATERIALIZE) читаются целиком, но это
+    # не таблицы: их собственные планы проверяются отдельными строками.
+    subqueries = {match[1] for match in map(SQLITE_SUBQUERY.match, details)
+                  if match}
+    scans = [match[1] for match in map(SQLITE_FULL_SCAN.match, details)
+             if match and match[1] not in subqueries]
+    return '\n'.join(details), scans
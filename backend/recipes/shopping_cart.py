@@ -0,0 +1,25 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_cart_version_key(user_id):
+    return f'shopping_cart:{user_id}:version'
+
+
+def get_cart_version(user_id):
+    """Версия корзины пользователя, меняется при каждом ее изменении."""
+    return cache.get_or_set(
+        get_cart_version_key(user_id), uuid4().hex, timeout=None)
+
+
+def bump_cart_versions(user_ids):
+    """
+    Версии меняются после коммита: иначе параллельный запрос успел бы
+    закешировать под новой версией еще не закоммиченную корзину.
+    """
+    versions = {get_cart_version_key(user_id): uuid4().hex
+                for user_id in user_ids}
+    transaction.on_commit(
+        lambda: cache.set_many(versions, timeout=None))
@@ -0,0 +1,88 @@
+from django.db.models import QuerySet
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from recipes.counters import change_favorites_count, change_recipes_count
+from recipes.models import (Favorite, Recipe, RecipeIngredient, ShoppingCart,
+                            ShoppingListItem)
+
+
+def is_cascade(sender, origin):
+    """
+    Удаление пришло каскадом от другой модели. Корзины и ингредиенты
+    удаляемого рецепта вычитает remove_recipe_from_shopping_lists,
+    а позиции удаляемых пользователя или ингредиента удаляются сами.
+    """
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is not sender
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        change_favorites_count(instance.recipe_id, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(sender, instance, **kwargs):
+    change_favorites_count(instance.recipe_id, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_recipes_count(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    change_recipes_count(instance.author_id, -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipe(
+            instance.user_id, instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, origin, **kwargs):
+    if not is_cascade(sender, origin):
+        ShoppingListItem.objects.remove_recipe(
+            instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(sender, instance, **kwargs):
+    ShoppingListItem.objects.change_recipe(
+        instance.id, ShoppingListItem.objects.get_recipe_amounts(instance.id),
+        {})
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remove_old_recipe_ingredient(sender, instance, raw, **kwargs):
+    """Перед изменением строки вычитает из корзин ее прежнее значение."""
+    if raw or instance._state.adding:
+        return
+    old = RecipeIngredient.objects.filter(pk=instance.pk).values_list(
+        'recipe_id', 'ingredient_id', 'amount').first()
+    if old is not None:
+        recipe_id, ingredient_id, amount = old
+        ShoppingListItem.objects.change_recipe(
+            recipe_id, {ingredient_id: amount}, {})
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def add_recipe_ingredient(sender, instance, raw, **kwargs):
+    if not raw:
+        ShoppingListItem.objects.change_recipe(
+            instance.recipe_id, {}, {instance.ingredient_id: instance.amount})
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_recipe_ingredient(sender, instance, origin, **kwargs):
+    if not is_cascade(sender, origin):
+        ShoppingListItem.objects.change_recipe(
+            instance.recipe_id, {instance.ingredient_id: instance.amount}, {})
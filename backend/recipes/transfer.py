@@ -0,0 +1,133 @@
+import json
+
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes.content_hash import get_content_hash
+from recipes.counters import change_recipes_count
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+def recipe_to_record(recipe):
+    """Рецепт в виде словаря для строки JSONL."""
+    return {
+        'author': recipe.author.email,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'image': recipe.image.name,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {'name': item.ingredient.name,
+             'measurement_unit': item.ingredient.measurement_unit,
+             'amount': item.amount}
+            for item in recipe.recipeingredient.all()
+        ],
+    }
+
+
+def import_chunk(lines):
+    """
+    Импортирует пачку строк JSONL одной транзакцией.
+    Авторы, теги и ингредиенты выбираются одним запросом на пачку,
+    рецепты и связи создаются через bulk_create.
+    Возвращает (создано, пропущено).
+    """
+    records = [json.loads(line) for line in lines if line.strip()]
+    authors = dict(User.objects.filter(
+        email__in={record['author'] for record in records}
+    ).values_list('email', 'id'))
+    tags = dict(Tag.objects.filter(
+        slug__in={slug for record in records for slug in record['tags']}
+    ).values_list('slug', 'id'))
+    ingredient_names = {item['name'] for record in records
+                        for item in record['ingredients']}
+    ingredients = {
+        (name, unit): pk for pk, name, unit in Ingredient.objects.filter(
+            name__in=ingredient_names).values_list(
+            'id', 'name', 'measurement_unit')
+    }
+    for record in records:
+        record['content_hash'] = get_content_hash(
+            record['name'], record['text'])
+    existing = set(Recipe.objects.filter(
+        content_hash__in={record['content_hash'] for record in records}
+    ).values_list('content_hash', flat=True))
+
+    accepted, skipped = [], 0
+    for record in records:
+        author_id = authors.get(record['author'])
+        keys = [(item['name'], item['measurement_unit'])
+                for item in record['ingredients']]
+        if (author_id is None
+                or record['content_hash'] in existing
+                or any(slug not in tags for slug in record['tags'])
+                or any(key not in ingredients for key in keys)):
+            skipped += 1
+            continue
+        existing.add(record['content_hash'])
+        accepted.append((record, Recipe(
+            author_id=author_id,
+            name=record['name'],
+            text=record['text'],
+            cooking_time=record['cooking_time'],
+            image=record['image'],
+            content_hash=record['content_hash'],
+        )))
+
+    while True:
+        try:
+            recipes = save_records(accepted, ingredients, tags)
+        except IntegrityError:
+            # Тот же рецепт мог оказаться в пачке другого процесса:
+            # такие записи отбрасываются, пачка загружается заново.
+            duplicates = set(Recipe.objects.filter(content_hash__in={
+                recipe.content_hash for _, recipe in accepted
+            }).values_list('content_hash', flat=True))
+            if not duplicates:
+                raise
+            skipped += sum(recipe.content_hash in duplicates
+                           for _, recipe in accepted)
+            accepted = [(record, recipe) for record, recipe in accepted
+                        if recipe.content_hash not in duplicates]
+        else:
+            return len(recipes), skipped
+
+
+@transaction.atomic
+def save_records(accepted, ingredients, tags):
+    """Создает рецепты пачки со связями, возвращает созданные рецепты."""
+    recipes = Recipe.objects.bulk_create(
+        [recipe for _, recipe in accepted])
+    for (record, _), recipe in zip(accepted, recipes):
+        recipe.pub_date = parse_datetime(record['pub_date'])
+    Recipe.objects.bulk_update(recipes, ('pub_date',))
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient_id=ingredients[
+                (item['name'], item['measurement_unit'])],
+            amount=item['amount'])
+        for (record, _), recipe in zip(accepted, recipes)
+        for item in record['ingredients']
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tags[slug])
+        for (record, _), recipe in zip(accepted, recipes)
+        for slug in record['tags']
+    )
+    for author_id, count in Counter(
+            recipe.author_id for recipe in recipes).items():
+        change_recipes_count(author_id, count)
+    return recipes
+
+
+def close_connections():
+    """Закрывает соединения перед форком процессов пула."""
+    connections.close_all()
@@ -8,8 +8,10 @@ User = get_user_model()
 class UserAdmin(BaseUserAdmin):
     """Кастомизация админки Пользователей."""
 
-    list_display = ('username', 'email', )
-    search_fields = ('username', "email", )
+    list_display = ('username', 'email', 'recipes_count')
+    search_fields = ('username', 'email')
+    readonly_fields = ('recipes_count',)
+    show_full_result_count = False
 
 
 admin.site.register(User, UserAdmin)
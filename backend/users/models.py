@@ -38,6 +38,12 @@ class User(AbstractUser):
         null=False,
     )
 
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False,
+    )
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
 
@@ -49,13 +55,27 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        """
+        Счетчик recipes_count меняется только атомарными UPDATE,
+        поэтому при сохранении профиля он не перезаписывается.
+        """
+        if (kwargs.get('update_fields') is None and not self._state.adding
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'recipes_count'
+            ]
+        super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     """Модель подписок"""
     follower = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='follower'
+        related_name='follower',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -76,6 +96,10 @@ class Follow(models.Model):
                 name='prevent_self_follow'
             )
         ]
+        indexes = [
+            models.Index(fields=('follower', 'id'),
+                         name='follow_follower_idx'),
+        ]
 
     def clean(self):
         if self.follower == self.author: